@@ -0,0 +1,111 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+ADVICE_CACHE_PATH = os.environ.get(
+    "ADVICE_CACHE_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".advice_cache.sqlite3"),
+)
+
+# Advice older than this is asked again, e.g. to pick up new guidance pages.
+ADVICE_CACHE_TTL = int(os.environ.get("ADVICE_CACHE_TTL", str(24 * 3600)))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS answers (
+    key TEXT PRIMARY KEY,
+    userid TEXT,
+    profile_hash TEXT NOT NULL,
+    answer TEXT NOT NULL,
+    created_at REAL NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS answers_userid ON answers (userid);
+"""
+
+
+def profile_hash(profile: str) -> str:
+    """The fingerprint of a profile; it changes whenever the data behind it does."""
+    return hashlib.sha256(profile.encode("utf-8")).hexdigest()
+
+
+class AnswerCache:
+    """Life Coach answers kept in SQLite, keyed on the question and profile.
+
+    The profile is built from the user's data, so new readings, meals or
+    posts give a new profile hash and the old answers stop matching. When a
+    user's profile hash changes, their answers for the old one are deleted.
+
+    Args:
+        path (str): The SQLite cache file.
+        ttl (int): Seconds an answer stays valid.
+    """
+
+    def __init__(self, path: str = ADVICE_CACHE_PATH, ttl: int = ADVICE_CACHE_TTL):
+        self.path = path
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.executescript(_SCHEMA)
+
+    @staticmethod
+    def key(question: str, fingerprint: str) -> str:
+        return hashlib.sha256(
+            f"{question}\x1f{fingerprint}".encode("utf-8")
+        ).hexdigest()
+
+    def get(self, question: str, profile: str):
+        """Returns the cached answer, or None when there is none or it expired."""
+        key = self.key(question, profile_hash(profile))
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT answer, created_at FROM answers WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None and time.time() - row[1] > self.ttl:
+                with self._connection:
+                    self._connection.execute(
+                        "DELETE FROM answers WHERE key = ?", (key,)
+                    )
+                row = None
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return row[0]
+
+    def put(self, question: str, profile: str, answer: str, userid: str = None):
+        fingerprint = profile_hash(profile)
+        with self._lock, self._connection:
+            if userid is not None:
+                self._connection.execute(
+                    "DELETE FROM answers WHERE userid = ? AND profile_hash != ?",
+                    (userid, fingerprint),
+                )
+            self._connection.execute(
+                "INSERT OR REPLACE INTO answers "
+                "(key, userid, profile_hash, answer, created_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (
+                    self.key(question, fingerprint),
+                    userid,
+                    fingerprint,
+                    answer,
+                    time.time(),
+                ),
+            )
+
+    def invalidate(self, userid: str) -> None:
+        """Forget every answer given to a user."""
+        with self._lock, self._connection:
+            self._connection.execute("DELETE FROM answers WHERE userid = ?", (userid,))
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
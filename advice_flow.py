@@ -0,0 +1,168 @@
+import copy
+import json
+import os
+import queue
+import threading
+from contextlib import contextmanager
+
+import streamlit as st
+
+from advice_cache import AnswerCache
+from advice_ingest import load_flow, request_flow
+from lazy_imports import lazy_import
+
+# The Langflow runtime is imported when the first graph is built, so the
+# Life Coach page renders before it is loaded.
+langflow_load = lazy_import("langflow.load")
+langflow_async_helpers = lazy_import("langflow.utils.async_helpers")
+
+# The flow runs two ways: here on Langflow graphs, and as the streaming
+# LangChain pipeline in advice_stream.py, which copies the flow's prompt,
+# Chroma search, ParseDataFrame and OpenAI model settings out of the flow JSON
+# but wires them together itself. Settings changed in the flow reach both; a
+# change to the flow's components or wiring (a new component, another search,
+# a different output) must be made in AdviceStreamer as well.
+
+# The flow's two TextInput components: the question and the user's profile.
+QUESTION_INPUT = "TextInput-KpJPD"
+PROFILE_INPUT = "TextInput-t9gYO"
+
+# How many requests can run the flow at the same time. Each one needs its
+# own graph, because a graph keeps the state of the run in its vertices.
+ADVICE_GRAPH_POOL_SIZE = int(os.environ.get("ADVICE_GRAPH_POOL_SIZE", "4"))
+
+
+class GraphPool:
+    """Prebuilt copies of a Langflow flow, checked out one request at a time.
+
+    Loading the flow parses the JSON and compiles the code of every
+    component, which is the slow part of running it. A graph is built on
+    first demand (up to ``size`` of them), then reused by every later
+    request; a request that finds all graphs busy waits for one.
+
+    Args:
+        flow (dict): The exported flow.
+        size (int): The most graphs to build.
+    """
+
+    def __init__(self, flow: dict, size: int = ADVICE_GRAPH_POOL_SIZE):
+        self.flow = flow
+        self.size = size
+        self._idle = queue.LifoQueue()
+        self._built = 0
+        self._lock = threading.Lock()
+
+    def _build(self):
+        # run_flow_from_json turns streaming off the same way.
+        return langflow_load.load_flow_from_json(
+            copy.deepcopy(self.flow), tweaks={"stream": False}
+        )
+
+    @contextmanager
+    def graph(self):
+        try:
+            graph = self._idle.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                build = self._built < self.size
+                if build:
+                    self._built += 1
+            if build:
+                try:
+                    graph = self._build()
+                except Exception:
+                    with self._lock:
+                        self._built -= 1
+                    raise
+            else:
+                graph = self._idle.get()
+        try:
+            yield graph
+        finally:
+            self._idle.put(graph)
+
+
+@st.cache_resource
+def get_advice_graph_pool() -> GraphPool:
+    """Returns the process-wide pool of diabetic-advice graphs.
+
+    The graphs run the flow without its ingestion branch; the pages it
+    searches are ingested ahead of time by advice_ingest.py.
+    """
+    return GraphPool(request_flow(load_flow()))
+
+
+def get_diabetic_advice(question: str, profile: str, pool: GraphPool = None):
+    """Run the diabetic-advice flow for one question.
+
+    Args:
+        question (str): The prompt for the question TextInput.
+        profile (str): The user's profile for the profile TextInput.
+        pool (GraphPool): The graphs to run it on; the process-wide pool by
+            default. Background threads pass it in, since they cannot use
+            Streamlit's resource cache.
+
+    Returns:
+        list: The flow's RunOutputs, like ``run_flow_from_json`` returns them.
+    """
+    with (pool or get_advice_graph_pool()).graph() as graph:
+        graph.get_vertex(PROFILE_INPUT).update_raw_params(
+            {"input_value": profile}, overwrite=True
+        )
+        # Only the question input receives the run's input value, so the
+        # profile set above is what reaches the prompt.
+        return langflow_async_helpers.run_until_complete(
+            graph.arun(
+                inputs=[{"input_value": question}],
+                inputs_components=[[QUESTION_INPUT]],
+                types=["text"],
+                outputs=[],
+                session_id="",
+                fallback_to_env_vars=True,
+            )
+        )
+
+
+@st.cache_resource
+def get_answer_cache() -> AnswerCache:
+    """Returns the process-wide Life Coach answer cache."""
+    return AnswerCache()
+
+
+def advice_text(result) -> str:
+    """The text the flow's TextOutput produced (a JSON question/answer object)."""
+    return result[0].outputs[0].results["text"].data["text"]
+
+
+def ask_life_coach(
+    question: str,
+    profile: str,
+    userid: str = None,
+    pool: GraphPool = None,
+    cache: AnswerCache = None,
+) -> str:
+    """Answer a Life Coach question, from the answer cache when possible.
+
+    Args:
+        question (str): The prompt for the question TextInput.
+        profile (str): The user's profile for the profile TextInput.
+        userid (str): The user asking. Their answers for an older profile
+            are dropped when a new one is cached.
+        pool (GraphPool): The graphs to run the flow on (see
+            get_diabetic_advice).
+        cache (AnswerCache): The answer cache; the process-wide one by default.
+
+    Returns:
+        str: The flow's answer text.
+    """
+    cache = cache or get_answer_cache()
+    answer = cache.get(question, profile)
+    if answer is None:
+        answer = advice_text(get_diabetic_advice(question, profile, pool))
+        try:
+            json.loads(answer)
+        except ValueError:
+            # Not the JSON the prompt asks for; let the next click try again.
+            return answer
+        cache.put(question, profile, answer, userid)
+    return answer
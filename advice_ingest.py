@@ -0,0 +1,262 @@
+"""Ingest the diabetic-advice flow's web sources into its Chroma store.
+
+The flow in langflow/diabetic-advice.json fetches two pages (URL nodes),
+splits them (SplitText), embeds them (OpenAIEmbeddings) and stores them in
+Chroma. This script does that ingestion ahead of time, with the same
+settings read from the flow, and advice_flow.py runs the flow without the
+URL and SplitText nodes. Every page's text is hashed, and a page is only
+split and embedded again when its hash changes:
+
+    python advice_ingest.py
+    python advice_ingest.py --save-snapshots documents/advice_snapshots
+    python advice_ingest.py --snapshots documents/advice_snapshots   # offline
+"""
+
+import argparse
+import copy
+import hashlib
+import json
+import os
+import re
+import time
+
+import requests
+
+from lazy_imports import lazy_import
+
+# Only ingestion needs these; advice_flow.py imports this module for the flow.
+bs4 = lazy_import("bs4")
+embedding_cache = lazy_import("embedding_cache")
+langchain_chroma = lazy_import("langchain_chroma")
+langchain_core_documents = lazy_import("langchain_core.documents")
+langchain_openai = lazy_import("langchain_openai")
+langchain_text_splitters = lazy_import("langchain_text_splitters")
+
+FILE_PATH_DIABETIC_ADVICE = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)),
+    "langflow/diabetic-advice.json",
+)
+
+# The flow's Chroma persist_directory ("diabetes") is relative to where
+# Langflow runs; both the ingestion and the requests use this absolute path.
+ADVICE_PERSIST_DIRECTORY = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)),
+    "diabetes",
+)
+
+# Which chunks belong to which page, and the hash of the page they came from.
+MANIFEST_FILENAME = "ingest_manifest.json"
+
+# Node types of the flow's ingestion branch.
+INGESTION_NODE_TYPES = ("URL", "SplitText")
+
+
+def load_flow(path: str = FILE_PATH_DIABETIC_ADVICE) -> dict:
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _node_type(node_id: str) -> str:
+    return node_id.split("-")[0]
+
+
+def flow_template(flow: dict, node_type: str) -> dict:
+    for node in flow["data"]["nodes"]:
+        if _node_type(node["id"]) == node_type:
+            return node["data"]["node"]["template"]
+    raise ValueError(f"The flow has no {node_type} node")
+
+
+def ingestion_settings(flow: dict) -> dict:
+    """The URLs, splitter, embedding model and collection the flow uses."""
+    urls = []
+    for node in flow["data"]["nodes"]:
+        if _node_type(node["id"]) == "URL":
+            urls.extend(node["data"]["node"]["template"]["urls"]["value"])
+    split = flow_template(flow, "SplitText")
+    chroma = flow_template(flow, "Chroma")
+    return {
+        "urls": urls,
+        "chunk_size": int(split["chunk_size"]["value"]),
+        "chunk_overlap": int(split["chunk_overlap"]["value"]),
+        "separator": split["separator"]["value"],
+        "embedding_model": flow_template(flow, "OpenAIEmbeddings")["model"]["value"],
+        "collection_name": chroma["collection_name"]["value"],
+    }
+
+
+def request_flow(flow: dict) -> dict:
+    """A copy of the flow without its ingestion branch.
+
+    The URL and SplitText nodes and their edges are removed, and Chroma
+    reads the persisted collection in ADVICE_PERSIST_DIRECTORY, so a request
+    only embeds the question and searches.
+    """
+    flow = copy.deepcopy(flow)
+    data = flow["data"]
+    removed = {
+        node["id"]
+        for node in data["nodes"]
+        if _node_type(node["id"]) in INGESTION_NODE_TYPES
+    }
+    data["nodes"] = [node for node in data["nodes"] if node["id"] not in removed]
+    data["edges"] = [
+        edge
+        for edge in data["edges"]
+        if edge["source"] not in removed and edge["target"] not in removed
+    ]
+    chroma = flow_template(flow, "Chroma")
+    chroma["ingest_data"]["value"] = ""
+    chroma["persist_directory"]["value"] = ADVICE_PERSIST_DIRECTORY
+    return flow
+
+
+def snapshot_filename(url: str) -> str:
+    return re.sub(r"[^A-Za-z0-9]+", "_", url.split("://", 1)[-1]).strip("_") + ".html"
+
+
+def fetch_html(url: str, snapshot_dir: str = None) -> str:
+    """The page's HTML, from the web or from ``snapshot_dir`` when given."""
+    if snapshot_dir:
+        with open(
+            os.path.join(snapshot_dir, snapshot_filename(url)), encoding="utf-8"
+        ) as f:
+            return f.read()
+    response = requests.get(url, timeout=30)
+    response.raise_for_status()
+    return response.text
+
+
+def html_to_text(html: str) -> str:
+    soup = bs4.BeautifulSoup(html, "html.parser")
+    for tag in soup(["script", "style", "noscript"]):
+        tag.decompose()
+    lines = (line.strip() for line in soup.get_text("\n").splitlines())
+    return "\n".join(line for line in lines if line)
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class IngestManifest:
+    """The content hash and chunk ids of every ingested page, kept as JSON."""
+
+    def __init__(self, directory: str = ADVICE_PERSIST_DIRECTORY):
+        self.path = os.path.join(directory, MANIFEST_FILENAME)
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                self.pages = json.load(f)
+        except FileNotFoundError:
+            self.pages = {}
+
+    def save(self) -> None:
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with open(f"{self.path}.tmp", "w", encoding="utf-8") as f:
+            json.dump(self.pages, f, indent=1)
+        os.replace(f"{self.path}.tmp", self.path)
+
+
+def ingest(
+    settings: dict,
+    vector_store,
+    manifest: IngestManifest,
+    snapshot_dir: str = None,
+    save_snapshot_dir: str = None,
+    force: bool = False,
+) -> dict:
+    """Bring the vector store up to date with the flow's pages.
+
+    Returns:
+        dict: URL -> "unchanged", "ingested" or "failed".
+    """
+    splitter = langchain_text_splitters.CharacterTextSplitter(
+        chunk_size=settings["chunk_size"],
+        chunk_overlap=settings["chunk_overlap"],
+        separator=settings["separator"],
+    )
+    results = {}
+    for url in settings["urls"]:
+        try:
+            html = fetch_html(url, snapshot_dir)
+        except (OSError, requests.exceptions.RequestException) as e:
+            print(f"Could not fetch {url}: {e}")
+            results[url] = "failed"
+            continue
+        if save_snapshot_dir:
+            os.makedirs(save_snapshot_dir, exist_ok=True)
+            with open(
+                os.path.join(save_snapshot_dir, snapshot_filename(url)),
+                "w",
+                encoding="utf-8",
+            ) as f:
+                f.write(html)
+
+        text = html_to_text(html)
+        digest = content_hash(text)
+        page = manifest.pages.get(url)
+        if page and page["sha256"] == digest and not force:
+            results[url] = "unchanged"
+            continue
+
+        chunks = splitter.split_text(text)
+        ids = [f"{digest[:16]}-{number}" for number in range(len(chunks))]
+        # The old version of the page, including chunks the flow itself stored
+        # before ingestion moved here (those have random ids).
+        stale = [
+            chunk_id
+            for chunk_id in vector_store.get(where={"source": url})["ids"]
+            if chunk_id not in ids
+        ]
+        vector_store.add_documents(
+            [
+                langchain_core_documents.Document(
+                    page_content=chunk, metadata={"source": url}
+                )
+                for chunk in chunks
+            ],
+            ids=ids,
+        )
+        if stale:
+            vector_store.delete(ids=stale)
+        manifest.pages[url] = {
+            "sha256": digest,
+            "ids": ids,
+            "ingested_at": time.time(),
+        }
+        manifest.save()
+        results[url] = "ingested"
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--snapshots", help="read the pages from this directory")
+    parser.add_argument("--save-snapshots", help="also save the fetched pages here")
+    parser.add_argument(
+        "--force", action="store_true", help="re-embed pages that did not change"
+    )
+    args = parser.parse_args()
+
+    settings = ingestion_settings(load_flow())
+    vector_store = langchain_chroma.Chroma(
+        collection_name=settings["collection_name"],
+        embedding_function=embedding_cache.CachedEmbeddings(
+            langchain_openai.OpenAIEmbeddings(model=settings["embedding_model"])
+        ),
+        persist_directory=ADVICE_PERSIST_DIRECTORY,
+    )
+    results = ingest(
+        settings,
+        vector_store,
+        IngestManifest(),
+        snapshot_dir=args.snapshots,
+        save_snapshot_dir=args.save_snapshots,
+        force=args.force,
+    )
+    for url, result in results.items():
+        print(f"{result:>9}: {url}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,309 @@
+import json
+import re
+import time
+
+import streamlit as st
+from langchain_chroma import Chroma
+from langchain_openai import ChatOpenAI, OpenAIEmbeddings
+
+from advice_ingest import ADVICE_PERSIST_DIRECTORY, flow_template, load_flow
+from embedding_cache import CachedEmbeddings
+
+_ANSWER_STRING = re.compile(r'"answer"\s*:\s*"')
+_RECOMMENDATIONS = re.compile(r'"recommendations"\s*:\s*\[')
+# The two halves of a surrogate pair, e.g. \ud83d\ude00 for one emoji.
+_HIGH_SURROGATE = re.compile(r"\\u[dD][89abAB][0-9a-fA-F]{2}")
+_LOW_SURROGATE = re.compile(r"\\u[dD][c-fC-F][0-9a-fA-F]{2}")
+
+# Follows the flow's own instructions when several questions share a prompt.
+BATCH_PROMPT = """{instructions}
+
+Context:
+User profile Information:
+
+Profile: {profile}
+
+User Questions:
+{questions}
+
+Notes/Facts: {notes}
+
+Response:
+"answers": {{"<question id>": {{"question": "", "answer": ""}}}} with one entry
+for every question id above.
+"""
+
+
+class AdviceStreamer:
+    """The diabetic-advice flow as a LangChain pipeline that streams tokens.
+
+    It reads the prompt template, the search settings and the model settings
+    from the flow JSON, so the answers match the Langflow run: the question
+    searches the persisted Chroma collection, the hits become the prompt's
+    notes, and the OpenAI model's tokens are yielded as they arrive. The
+    wiring of those steps is this class's own, so a change to the flow's
+    components must be made here too (see advice_flow.py).
+
+    Args:
+        flow (dict): The exported diabetic-advice flow.
+    """
+
+    def __init__(self, flow: dict):
+        prompt = flow_template(flow, "Prompt")
+        chroma = flow_template(flow, "Chroma")
+        model = flow_template(flow, "OpenAIModel")
+        parse = flow_template(flow, "ParseDataFrame")
+        self.prompt_template = prompt["template"]["value"]
+        self.notes_template = parse["template"]["value"]
+        self.notes_separator = parse["sep"]["value"]
+        self.number_of_results = int(chroma["number_of_results"]["value"])
+        self.vector_store = Chroma(
+            collection_name=chroma["collection_name"]["value"],
+            embedding_function=CachedEmbeddings(
+                OpenAIEmbeddings(
+                    model=flow_template(flow, "OpenAIEmbeddings")["model"]["value"]
+                )
+            ),
+            persist_directory=ADVICE_PERSIST_DIRECTORY,
+        )
+        self.llm = ChatOpenAI(
+            model=model["model_name"]["value"],
+            temperature=float(model["temperature"]["value"]),
+            seed=model["seed"]["value"],
+            max_retries=model["max_retries"]["value"],
+            timeout=model["timeout"]["value"],
+        )
+
+    def notes(self, question: str) -> str:
+        documents = self.vector_store.similarity_search(
+            question, k=self.number_of_results
+        )
+        return self.notes_separator.join(
+            self.notes_template.format(text=document.page_content)
+            for document in documents
+        )
+
+    def batch_notes(self, questions: list) -> str:
+        """Notes for several questions at once, no more than for one of them.
+
+        The best hits of every question are taken in turn, so each question
+        gets its share of the notes and a chunk found twice is sent once.
+        """
+        hits = [
+            self.vector_store.similarity_search(question, k=self.number_of_results)
+            for question in questions
+        ]
+        texts = []
+        for rank in range(self.number_of_results):
+            for documents in hits:
+                if rank < len(documents) and documents[rank].page_content not in texts:
+                    texts.append(documents[rank].page_content)
+        return self.notes_separator.join(
+            self.notes_template.format(text=text)
+            for text in texts[: self.number_of_results]
+        )
+
+    def answer_all(self, questions: dict, profile: str) -> dict:
+        """Answer several questions about one profile with a single completion.
+
+        The profile and the notes are sent once instead of once per question,
+        and the model is asked for a JSON object with an answer per question.
+
+        Args:
+            questions (dict): Question id -> question.
+            profile (str): The user's profile.
+
+        Returns:
+            dict: Question id -> answer text in the flow's
+            ``{"question": ..., "answer": ...}`` format, for the questions
+            the model answered.
+        """
+        started = time.perf_counter()
+        prompt = BATCH_PROMPT.format(
+            instructions=self.prompt_template.split("\n\nContext:")[0],
+            profile=profile,
+            questions="\n".join(
+                f"{key}: {question}" for key, question in questions.items()
+            ),
+            notes=self.batch_notes(list(questions.values())),
+        )
+        response = self.llm.invoke(prompt, response_format={"type": "json_object"})
+        print(
+            f"Life Coach answered {len(questions)} questions in one prompt "
+            f"in {time.perf_counter() - started:.2f}s"
+        )
+        try:
+            answers = json.loads(response.content)["answers"]
+        except (json.JSONDecodeError, KeyError, TypeError) as e:
+            print(f"Could not split the batched Life Coach answer: {e}")
+            return {}
+        if not isinstance(answers, dict):
+            return {}
+        return {
+            key: json.dumps(
+                {"question": question, "answer": answers[key].get("answer")}
+            )
+            for key, question in questions.items()
+            if isinstance(answers.get(key), dict) and "answer" in answers[key]
+        }
+
+    def stream(self, question: str, profile: str):
+        """Yield the completion's text as it arrives and log time to first token."""
+        started = time.perf_counter()
+        prompt = self.prompt_template.format(
+            profile=profile, user_question=question, notes=self.notes(question)
+        )
+        first_token = None
+        for chunk in self.llm.stream(prompt):
+            if not chunk.content:
+                continue
+            if first_token is None:
+                first_token = time.perf_counter() - started
+                print(f"Life Coach time to first token: {first_token:.2f}s")
+            yield chunk.content
+        print(
+            f"Life Coach streamed answer in {time.perf_counter() - started:.2f}s "
+            f"(first token after {first_token or 0:.2f}s)"
+        )
+
+
+@st.cache_resource
+def get_advice_streamer() -> AdviceStreamer:
+    """Returns the process-wide streaming version of the diabetic-advice flow."""
+    return AdviceStreamer(load_flow())
+
+
+def answer_pieces(text: str) -> list:
+    """The pieces to show for a complete answer, the same as a stream gives."""
+    parser = AdviceStreamParser()
+    return parser.feed(text) + parser.close()
+
+
+class AdviceStreamParser:
+    """Turns the streamed JSON answer into text to show while it arrives.
+
+    The flow answers ``{"question": ..., "answer": ...}`` where the answer
+    is either a string or ``{"recommendations": [{"advice": ...}, ...]}``.
+    A string answer is passed on character by character as it is decoded;
+    every recommendation is passed on as soon as its object is complete.
+    """
+
+    def __init__(self):
+        self.text = ""
+        self._emitted = False
+        # Answer string: where the undecoded part starts, None until found.
+        self._string_at = None
+        self._string_done = False
+        # Recommendations: scanner state over self.text.
+        self._scan_at = None
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        self._object_at = None
+
+    def feed(self, chunk: str) -> list:
+        self.text += chunk
+        if self._string_at is None and self._scan_at is None:
+            match = _ANSWER_STRING.search(self.text)
+            if match:
+                self._string_at = match.end()
+            else:
+                match = _RECOMMENDATIONS.search(self.text)
+                if match:
+                    self._scan_at = match.end()
+        if self._string_at is not None:
+            return self._decode_string()
+        if self._scan_at is not None:
+            return self._scan_recommendations()
+        return []
+
+    def _decode_string(self) -> list:
+        if self._string_done:
+            return []
+        end = self._string_at
+        text = self.text
+        while end < len(text):
+            char = text[end]
+            if char == '"':
+                self._string_done = True
+                break
+            if char == "\\":
+                # Wait for the whole escape sequence before decoding it.
+                size = 6 if text[end + 1 : end + 2] == "u" else 2
+                if _HIGH_SURROGATE.fullmatch(text, end, end + 6):
+                    # Decode a pair as one character; half of it can not be
+                    # written to the page.
+                    low = text[end + 6 : end + 12]
+                    if _LOW_SURROGATE.fullmatch(low):
+                        size = 12
+                    elif len(low) < 6 and low.startswith("\\u"[: len(low)]):
+                        break
+                if end + size > len(text):
+                    break
+                end += size
+            else:
+                end += 1
+        raw = text[self._string_at : end]
+        self._string_at = end
+        if not raw:
+            return []
+        self._emitted = True
+        return [json.loads(f'"{raw}"')]
+
+    def _scan_recommendations(self) -> list:
+        pieces = []
+        position = self._scan_at
+        text = self.text
+        while position < len(text):
+            char = text[position]
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char == "{":
+                if self._depth == 0:
+                    self._object_at = position
+                self._depth += 1
+            elif char == "}":
+                self._depth -= 1
+                if self._depth == 0 and self._object_at is not None:
+                    piece = self._advice(text[self._object_at : position + 1])
+                    if piece:
+                        pieces.append(piece)
+                    self._object_at = None
+            elif char == "]" and self._depth == 0:
+                self._scan_at = len(text) + 1
+                return pieces
+            position += 1
+        self._scan_at = position
+        return pieces
+
+    def _advice(self, raw: str):
+        try:
+            recommendation = json.loads(raw)
+        except json.JSONDecodeError:
+            return None
+        advice = (
+            recommendation.get("advice") if isinstance(recommendation, dict) else None
+        )
+        if advice is None:
+            return None
+        self._emitted = True
+        return f"{advice}\n\n"
+
+    def close(self) -> list:
+        """Whatever could not be shown incrementally, once the stream ended."""
+        if self._emitted:
+            return []
+        try:
+            answer = json.loads(self.text)["answer"]
+        except (json.JSONDecodeError, KeyError, TypeError):
+            return [self.text]
+        if isinstance(answer, dict) and "recommendations" in answer:
+            return [f"{item['advice']}\n\n" for item in answer["recommendations"]]
+        return [answer if isinstance(answer, str) else json.dumps(answer)]
@@ -0,0 +1,106 @@
+"""Benchmark the CGM analytics on the sample blood sugar files.
+
+Each sample patient in documents/fakedate is timed as is, then resampled to
+a reading every 5 minutes (like a CGM) over the same months and copied to a
+cohort of patients with a little noise, which is the load the analytics
+have to carry in production:
+
+    python benchmark_cgm.py --patients 100
+"""
+
+import argparse
+import glob
+import os
+import statistics
+import time
+
+import numpy as np
+import pandas as pd
+
+from cgm_analytics import agp_percentiles, daily_summary, glucose_metrics
+from timeseries import TimeSeries
+
+FILE_PATH_FAKE_DATA = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)),
+    "documents/fakedate",
+)
+
+
+def load_sample_series() -> dict:
+    series = {}
+    for path in sorted(
+        glob.glob(os.path.join(FILE_PATH_FAKE_DATA, "diabetic_patient*_bloodsugar.csv"))
+    ):
+        frame = pd.read_csv(path, dtype=str)
+        series[os.path.basename(path)] = TimeSeries.from_frame(
+            frame, "DateTime", "BloodSugarLevel(mg/dl)"
+        )
+    return series
+
+
+def resample_every_5_minutes(series: TimeSeries, rng, noise: float) -> TimeSeries:
+    times = np.arange(series.start, series.end, np.timedelta64(5, "m")).astype(
+        "datetime64[s]"
+    )
+    values = np.interp(
+        times.astype("int64"),
+        series.times.astype("int64"),
+        series.values.astype("float64"),
+    )
+    values += rng.normal(0, noise, len(values))
+    return TimeSeries(times, values, name=series.name)
+
+
+def analyze(series: TimeSeries) -> None:
+    glucose_metrics(series)
+    agp_percentiles(series)
+    daily_summary(series)
+
+
+def time_analysis(series_list) -> list:
+    seconds = []
+    for series in series_list:
+        started = time.perf_counter()
+        analyze(series)
+        seconds.append(time.perf_counter() - started)
+    return seconds
+
+
+def report(label: str, series_list, seconds) -> None:
+    readings = sum(len(series) for series in series_list)
+    print(
+        f"{label}: {len(series_list)} patients, {readings} readings, "
+        f"median {statistics.median(seconds) * 1000:.2f} ms per patient, "
+        f"total {sum(seconds) * 1000:.1f} ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--patients", type=int, default=30, help="5-minute CGM patients to analyze"
+    )
+    parser.add_argument("--seed", type=int, default=0, help="random seed")
+    args = parser.parse_args()
+
+    samples = load_sample_series()
+    for name, series in samples.items():
+        metrics = glucose_metrics(series)
+        print(
+            f"{name}: {metrics['readings']} readings, mean {metrics['mean']:.1f}, "
+            f"GMI {metrics['gmi']:.2f}%, CV {metrics['cv']:.1f}%, "
+            f"TIR {metrics['time_in_ranges']['in_range']:.0%}"
+        )
+    series_list = list(samples.values())
+    report("sample files", series_list, time_analysis(series_list))
+
+    rng = np.random.default_rng(args.seed)
+    cohort = [
+        resample_every_5_minutes(series_list[number % len(series_list)], rng, 15)
+        for number in range(args.patients)
+    ]
+    report("5-minute CGM", cohort, time_analysis(cohort))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""Benchmark the Login.py data path against the local Firestore stand-in.
+
+For a sample of seeded patients this times what a login and "Show my
+profile" cost: the users directory lookup, loading the profile datasets
+and building the profile. It reports Firestore reads, wall time, the
+memory the datasets take in a session, the profile's tokens and peak
+Python memory. Seed the database first:
+
+    python seed_fake_db.py --users 100 --reset
+    python benchmark_login.py --sample 20
+    python benchmark_login.py --sample 20 --snapshots   # warm-snapshot logins
+"""
+
+import argparse
+import random
+import statistics
+import tempfile
+import time
+import tracemalloc
+
+from data_backend import FAKE_DB_PATH, get_fake_db
+from firestore_loader import SESSION_FRAMES, ReadCounter, load_user_frames
+from profile_datasets import PROFILE_DATASETS
+from profile_stats import (
+    PROFILE_FRAMES,
+    build_profile,
+    compute_profile_stats,
+    count_tokens,
+)
+from seed_fake_db import patient_email
+from snapshot_store import UserSnapshot
+from timeseries import TimeSeries
+from users_directory import UsersDirectory
+
+
+def dataset_bytes(data) -> int:
+    if isinstance(data, TimeSeries):
+        return data.nbytes
+    return int(data.memory_usage(index=True, deep=True).sum())
+
+
+def login(db, directory: UsersDirectory, email: str, snapshot_root=None) -> dict:
+    """Run one login and profile build and returns the seconds of each step."""
+    timings = {}
+    started = time.perf_counter()
+    user = directory.find_by_email(email)
+    timings["lookup"] = time.perf_counter() - started
+
+    read_counter = ReadCounter()
+    snapshot = UserSnapshot(user["userid"], snapshot_root) if snapshot_root else None
+    started = time.perf_counter()
+    frames = {
+        key: frame
+        for key, frame, _ in load_user_frames(
+            db,
+            user["userid"],
+            {key: SESSION_FRAMES[key] for key in PROFILE_DATASETS},
+            read_counter=read_counter,
+            snapshot=snapshot,
+        )
+    }
+    timings["load"] = time.perf_counter() - started
+    timings["reads"] = read_counter.total
+    timings["bytes"] = sum(dataset_bytes(data) for data in frames.values())
+
+    started = time.perf_counter()
+    stats = compute_profile_stats({key: frames[key] for key in PROFILE_FRAMES})
+    profile = build_profile(user, stats, frames["post_data"])
+    timings["profile"] = time.perf_counter() - started
+    timings["tokens"] = count_tokens(profile)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--db", default=FAKE_DB_PATH, help="seeded SQLite file")
+    parser.add_argument("--sample", type=int, default=10, help="logins to time")
+    parser.add_argument(
+        "--snapshots",
+        action="store_true",
+        help="log every user in twice and time the second, snapshot-backed login",
+    )
+    parser.add_argument("--seed", type=int, default=0, help="random seed")
+    args = parser.parse_args()
+
+    db = get_fake_db(args.db)
+    users = db.count("users")
+    if not users:
+        print(f"{args.db} has no users, run seed_fake_db.py first")
+        return
+
+    tracemalloc.start()
+    started = time.perf_counter()
+    directory = UsersDirectory(db)
+    directory.users
+    directory_seconds = time.perf_counter() - started
+    print(f"Users directory: {users} users in {directory_seconds:.3f}s")
+
+    numbers = random.Random(args.seed).sample(range(users), min(args.sample, users))
+    results = []
+    with tempfile.TemporaryDirectory() as snapshot_root:
+        for number in numbers:
+            email = patient_email(number)
+            if args.snapshots:
+                login(db, directory, email, snapshot_root)
+                results.append(login(db, directory, email, snapshot_root))
+            else:
+                results.append(login(db, directory, email))
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    for step in ("lookup", "load", "profile"):
+        seconds = [result[step] for result in results]
+        print(
+            f"{step:>8}: median {statistics.median(seconds) * 1000:8.1f} ms, "
+            f"max {max(seconds) * 1000:8.1f} ms"
+        )
+    print(f"   reads: {statistics.mean(r['reads'] for r in results):.0f} per login")
+    print(
+        f" session: {statistics.mean(r['bytes'] for r in results) / 2**10:.0f} KiB "
+        "of datasets per login"
+    )
+    print(
+        f"  tokens: {statistics.mean(r['tokens'] for r in results):.0f} per profile, "
+        f"max {max(r['tokens'] for r in results)}"
+    )
+    print(f"    peak: {peak / 2**20:.1f} MiB (tracemalloc, slows the timings)")
+
+
+if __name__ == "__main__":
+    main()
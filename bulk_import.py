@@ -0,0 +1,351 @@
+"""Bulk import CSV exports (blood sugar, weight, exercise, food, ...) into Firestore.
+
+Rows are streamed from the CSV files, mapped to the field names Login.py
+reads, and written in batched commits of up to 500 documents by several
+worker threads. Every document id is derived from the row, so importing a
+file twice writes the same documents again instead of duplicating them. A
+measurement (glucose, weight, sleep, water) is identified by its owner and
+timestamp, so a corrected value replaces the reading it corrects. An
+interrupted import resumes from its checkpoint:
+
+    python bulk_import.py bloodsugars documents/fakedate/diabetic_patient1_bloodsugar.csv --userid 11111
+    python bulk_import.py foods documents/fakedate/diabetic_food.csv
+    DATA_BACKEND=fake python bulk_import.py weights export.csv --userid patient00001
+"""
+
+import argparse
+import csv
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import firebase_admin
+from firebase_admin import credentials
+
+from data_backend import DATA_BACKEND, MAX_BATCH_WRITES, get_db
+from firestore_loader import FRAME_COLUMNS, PROFILE_COLLECTIONS, TIME_SERIES_COLUMNS
+
+FILE_PATH_SERVICEACCOUNTKEY = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)),
+    "diabeticvirtualassistant-firebase-adminsdk-fbsvc-b7c63be69b.json",
+)
+
+CHECKPOINT_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), ".bulk_import_checkpoint.json"
+)
+
+# Other names CGM and app exports use for the fields, per collection. The
+# Firestore field names themselves (from FRAME_COLUMNS) are always accepted.
+# Headers are compared in lower case, without spaces, dashes and underscores.
+FIELD_ALIASES = {
+    "bloodsugars": {
+        "timestamp": "DateTime",
+        "date": "DateTime",
+        "time": "DateTime",
+        "glucose": "BloodSugarLevel(mg/dl)",
+        "glucose(mg/dl)": "BloodSugarLevel(mg/dl)",
+        "glucosevalue": "BloodSugarLevel(mg/dl)",
+        "bloodsugar": "BloodSugarLevel(mg/dl)",
+        "bloodsugarlevel": "BloodSugarLevel(mg/dl)",
+    },
+    "weights": {
+        "datetime": "Date",
+        "weight": "Weight(pounds)",
+        "weight(lbs)": "Weight(pounds)",
+    },
+    "sleep": {"sleep": "Sleep(hours)", "hours": "Sleep(hours)"},
+    "water": {"water": "Water(ounces)", "ounces": "Water(ounces)"},
+}
+
+MAX_ATTEMPTS = 5
+
+
+def _normalize(header: str) -> str:
+    return re.sub(r"[\s_\-]", "", header).lower()
+
+
+def field_mapping(collection_name: str, headers) -> dict:
+    """Map the CSV headers to Firestore field names.
+
+    Args:
+        collection_name (str): One of the keys of PROFILE_COLLECTIONS.
+        headers: The CSV header row.
+
+    Returns:
+        dict: CSV header -> Firestore field, for the headers that map to a
+        field the app reads. Other columns are not imported.
+    """
+    fields = {field for field, _ in FRAME_COLUMNS[collection_name].values()}
+    fields.add(PROFILE_COLLECTIONS[collection_name][0])
+    known = {_normalize(field): field for field in fields}
+    known.update(FIELD_ALIASES.get(collection_name, {}))
+    mapping = {}
+    for header in headers:
+        field = known.get(_normalize(header))
+        if field is not None and field not in mapping.values():
+            mapping[header] = field
+    return mapping
+
+
+def numeric_fields(collection_name: str) -> set:
+    return {
+        field
+        for field, dtype in FRAME_COLUMNS[collection_name].values()
+        if dtype == "float64"
+    }
+
+
+def parse_number(value: str):
+    """A CSV cell as an int or float when it holds a number, else unchanged."""
+    try:
+        number = float(value)
+    except ValueError:
+        return value
+    return int(number) if number.is_integer() and "." not in value else number
+
+
+def document_id(collection_name: str, document: dict) -> str:
+    """A deterministic id: the same row always becomes the same document.
+
+    A time series has one reading per user and timestamp, so its id only
+    depends on those: a row with a corrected value replaces the reading.
+    Other rows are identified by their whole content, so identical rows are
+    the same record exported twice and end up as one document.
+    """
+    user_field, date_field = PROFILE_COLLECTIONS[collection_name]
+    if collection_name in TIME_SERIES_COLUMNS and date_field in document:
+        key = [document.get(user_field), document[date_field]]
+    else:
+        key = document
+    content = json.dumps([collection_name, key], sort_keys=True, default=str)
+    return hashlib.sha1(content.encode("utf-8")).hexdigest()[:20]
+
+
+def read_documents(path: str, collection_name: str, userid: str = None):
+    """Yield ``(document id, document)`` for every row of a CSV file.
+
+    The file is streamed, so its size does not matter. ``userid`` sets the
+    owner for files without a userid column and overrides the column if
+    there is one.
+    """
+    user_field = PROFILE_COLLECTIONS[collection_name][0]
+    numbers = numeric_fields(collection_name)
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        reader = csv.DictReader(f)
+        mapping = field_mapping(collection_name, reader.fieldnames or [])
+        if userid is None and user_field not in mapping.values():
+            raise ValueError(f"{path} has no {user_field} column, pass --userid")
+        for row in reader:
+            document = {}
+            for header, field in mapping.items():
+                value = row[header]
+                if value is None or value == "":
+                    continue
+                document[field] = parse_number(value) if field in numbers else value
+            if userid is not None:
+                document[user_field] = userid
+            yield document_id(collection_name, document), document
+
+
+def file_mapping(path: str, collection_name: str) -> dict:
+    """field_mapping of a CSV file's header row."""
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        return field_mapping(collection_name, next(csv.reader(f), []))
+
+
+def _chunks(iterable, size: int):
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+class Checkpoint:
+    """How many rows of each file are safely committed, kept in a JSON file.
+
+    Batches finish out of order, so a file's checkpoint only moves past a
+    batch once every batch before it has been committed too.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        try:
+            with open(path, encoding="utf-8") as f:
+                self._rows = json.load(f)
+        except FileNotFoundError:
+            self._rows = {}
+
+    @staticmethod
+    def key(
+        path: str, collection_name: str, userid: str = None, mapping: dict = None
+    ) -> str:
+        # A file that changed since the last run is imported from the start,
+        # and so is one imported for another user or with other field names.
+        stat = os.stat(path)
+        options = json.dumps([userid, mapping], sort_keys=True)
+        return ":".join(
+            [collection_name, os.path.abspath(path), str(stat.st_size)]
+            + [str(int(stat.st_mtime))]
+            + [hashlib.sha1(options.encode("utf-8")).hexdigest()[:12]]
+        )
+
+    def rows(self, key: str) -> int:
+        return self._rows.get(key, 0)
+
+    def advance(self, key: str, rows: int) -> None:
+        with self._lock:
+            self._rows[key] = rows
+            with open(f"{self.path}.tmp", "w", encoding="utf-8") as f:
+                json.dump(self._rows, f, indent=1)
+            os.replace(f"{self.path}.tmp", self.path)
+
+
+def commit_batch(db, collection_name: str, documents) -> int:
+    """Write one batch, retrying with backoff, and returns the rows it covers.
+
+    Rows with the same id (a reading and its correction) are written once,
+    with the last row's values.
+    """
+    collection = db.collection(collection_name)
+    for attempt in range(1, MAX_ATTEMPTS + 1):
+        batch = db.batch()
+        for docid, document in dict(documents).items():
+            batch.set(collection.document(docid), document)
+        try:
+            batch.commit()
+            return len(documents)
+        except Exception as e:
+            if attempt == MAX_ATTEMPTS:
+                raise
+            print(f"Batch commit failed ({e}), retrying in {2**attempt}s")
+            time.sleep(2**attempt)
+
+
+def import_file(
+    db,
+    path: str,
+    collection_name: str,
+    userid: str = None,
+    checkpoint: Checkpoint = None,
+    workers: int = 8,
+    batch_size: int = MAX_BATCH_WRITES,
+) -> int:
+    """Import one CSV file and returns the number of documents written.
+
+    At most ``2 * workers`` batches are in memory at a time, however large
+    the file is.
+    """
+    if not 0 < batch_size <= MAX_BATCH_WRITES:
+        raise ValueError(f"batch_size must be between 1 and {MAX_BATCH_WRITES}")
+    key = Checkpoint.key(
+        path, collection_name, userid, file_mapping(path, collection_name)
+    )
+    skip = checkpoint.rows(key) if checkpoint else 0
+    if skip:
+        print(f"{path}: resuming after {skip} rows")
+
+    documents = read_documents(path, collection_name, userid)
+    for _ in range(skip):
+        next(documents, None)
+
+    written = 0
+    started = time.perf_counter()
+    # Batch number -> row count, for the batches that are committed but can
+    # not move the checkpoint yet because an earlier batch is still running.
+    finished = {}
+    next_to_checkpoint = 0
+    rows_committed = skip
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="importer") as pool:
+        pending = {}
+        for number, chunk in enumerate(_chunks(documents, batch_size)):
+            if len(pending) >= 2 * workers:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    finished[pending.pop(future)] = future.result()
+            pending[pool.submit(commit_batch, db, collection_name, chunk)] = number
+
+            while next_to_checkpoint in finished:
+                count = finished.pop(next_to_checkpoint)
+                written += count
+                rows_committed += count
+                next_to_checkpoint += 1
+                if checkpoint:
+                    checkpoint.advance(key, rows_committed)
+            if number % 20 == 19:
+                seconds = time.perf_counter() - started
+                print(
+                    f"{path}: {written} documents, {written / seconds:.0f} documents/s"
+                )
+
+        for future in wait(pending).done:
+            finished[pending[future]] = future.result()
+        for number in sorted(finished):
+            written += finished[number]
+            rows_committed += finished[number]
+    if checkpoint:
+        checkpoint.advance(key, rows_committed)
+    return written
+
+
+def init_firebase(credentials_path: str) -> None:
+    try:
+        firebase_admin.get_app()
+    except ValueError:
+        firebase_admin.initialize_app(credentials.Certificate(credentials_path))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("collection", choices=sorted(PROFILE_COLLECTIONS))
+    parser.add_argument("paths", nargs="+", help="CSV files to import")
+    parser.add_argument("--userid", help="owner of the rows (overrides the column)")
+    parser.add_argument("--workers", type=int, default=8, help="parallel commits")
+    parser.add_argument(
+        "--batch-size", type=int, default=MAX_BATCH_WRITES, help="writes per commit"
+    )
+    parser.add_argument("--checkpoint", default=CHECKPOINT_PATH)
+    parser.add_argument(
+        "--restart", action="store_true", help="ignore the checkpoint and start over"
+    )
+    parser.add_argument("--credentials", default=FILE_PATH_SERVICEACCOUNTKEY)
+    args = parser.parse_args()
+
+    if DATA_BACKEND == "firestore":
+        init_firebase(args.credentials)
+    db = get_db()
+    if args.restart and os.path.exists(args.checkpoint):
+        os.remove(args.checkpoint)
+    checkpoint = Checkpoint(args.checkpoint)
+
+    total = 0
+    started = time.perf_counter()
+    for path in args.paths:
+        written = import_file(
+            db,
+            path,
+            args.collection,
+            userid=args.userid,
+            checkpoint=checkpoint,
+            workers=args.workers,
+            batch_size=args.batch_size,
+        )
+        print(f"{path}: imported {written} documents into {args.collection}")
+        total += written
+    seconds = time.perf_counter() - started
+    print(
+        f"Imported {total} documents in {seconds:.1f}s "
+        f"({total / seconds if seconds else 0:.0f} documents/s)"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+import numpy as np
+import pandas as pd
+
+from timeseries import TimeSeries
+
+# The glucose bands of the international consensus on CGM time in range, in
+# mg/dl, as (name, lower bound, upper bound). Below 54 is very low and below
+# 70 low, above 180 high and above 250 very high: 70 and 180 are both in range.
+GLUCOSE_BANDS = (
+    ("very_low", -np.inf, 54),
+    ("low", 54, 70),
+    ("in_range", 70, 180),
+    ("high", 180, 250),
+    ("very_high", 250, np.inf),
+)
+
+# The percentiles drawn in an ambulatory glucose profile (AGP).
+AGP_PERCENTILES = (5, 25, 50, 75, 95)
+
+# Edges that belong to the band above them (54, 70) and below them (180, 250).
+_LOWER_EDGES = np.array([lower for _, lower, _ in GLUCOSE_BANDS[1:3]], dtype="float32")
+_UPPER_EDGES = np.array([upper for _, _, upper in GLUCOSE_BANDS[2:4]], dtype="float32")
+
+
+def _present(series: TimeSeries):
+    keep = ~np.isnan(series.values)
+    return series.times[keep], series.values[keep]
+
+
+def time_in_ranges(series: TimeSeries) -> dict:
+    """The share of readings in each of the GLUCOSE_BANDS.
+
+    Args:
+        series (TimeSeries): Blood sugar readings in mg/dl.
+
+    Returns:
+        dict: Band name -> fraction of the readings (0 to 1). All zero when
+        there are no readings.
+    """
+    _, values = _present(series)
+    counts = np.bincount(
+        np.searchsorted(_LOWER_EDGES, values, side="right")
+        + np.searchsorted(_UPPER_EDGES, values, side="left"),
+        minlength=len(GLUCOSE_BANDS),
+    )
+    total = counts.sum()
+    return {
+        name: float(count / total) if total else 0.0
+        for (name, _, _), count in zip(GLUCOSE_BANDS, counts)
+    }
+
+
+def glucose_management_indicator(mean_glucose: float) -> float:
+    """GMI, the A1c (in %) that a mean CGM glucose (in mg/dl) corresponds to."""
+    return 3.31 + 0.02392 * mean_glucose
+
+
+def glucose_metrics(series: TimeSeries) -> dict:
+    """The standard summary of a CGM trace.
+
+    Args:
+        series (TimeSeries): Blood sugar readings in mg/dl.
+
+    Returns:
+        dict: readings, days, mean, std, cv (coefficient of variation in %),
+        gmi (in %) and time_in_ranges (see time_in_ranges). The numbers are
+        None when there are no readings.
+    """
+    times, values = _present(series)
+    if not len(values):
+        return {
+            "readings": 0,
+            "days": 0,
+            "mean": None,
+            "std": None,
+            "cv": None,
+            "gmi": None,
+            "time_in_ranges": time_in_ranges(series),
+        }
+    values = values.astype("float64")
+    mean = float(values.mean())
+    std = float(values.std(ddof=1)) if len(values) > 1 else 0.0
+    return {
+        "readings": int(len(values)),
+        "days": int(np.count_nonzero(np.diff(times.astype("datetime64[D]")))) + 1,
+        "mean": mean,
+        "std": std,
+        "cv": 100 * std / mean if mean else None,
+        "gmi": glucose_management_indicator(mean),
+        "time_in_ranges": time_in_ranges(series),
+    }
+
+
+def agp_percentiles(series: TimeSeries, percentiles=AGP_PERCENTILES) -> pd.DataFrame:
+    """Hourly glucose percentiles over all days, as drawn in an AGP report.
+
+    Args:
+        series (TimeSeries): Blood sugar readings in mg/dl.
+        percentiles: The percentiles to compute.
+
+    Returns:
+        pd.DataFrame: One row per hour of the day (0-23) that has readings and
+        one column per percentile, named like "p50".
+    """
+    times, values = _present(series)
+    hours = (times - times.astype("datetime64[D]")).astype("timedelta64[h]")
+    hours = hours.astype("int16")
+    # Sort by glucose, then stably by hour (a radix sort for int16), so each
+    # hour's readings are one sorted run and every percentile is a (linearly
+    # interpolated) index into it.
+    order = np.argsort(values)
+    order = order[np.argsort(hours[order], kind="stable")]
+    ordered = values[order].astype("float64")
+    counts = np.bincount(hours, minlength=24)
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    present = np.flatnonzero(counts)
+    positions = (counts[present, None] - 1) * (
+        np.asarray(percentiles, dtype="float64") / 100
+    )
+    below = np.floor(positions).astype("int64")
+    above = np.minimum(below + 1, counts[present, None] - 1)
+    fraction = positions - below
+    lower = ordered[starts[present, None] + below]
+    upper = ordered[starts[present, None] + above]
+    return pd.DataFrame(
+        lower + (upper - lower) * fraction,
+        index=pd.Index(present, name="hour"),
+        columns=[f"p{p}" for p in percentiles],
+    )
+
+
+def daily_summary(series: TimeSeries) -> pd.DataFrame:
+    """Per-day readings, mean, min, max and time in range (70-180 mg/dl).
+
+    Returns:
+        pd.DataFrame: Indexed by date, oldest first.
+    """
+    times, values = _present(series)
+    columns = ["readings", "mean", "min", "max", "time_in_range"]
+    if not len(values):
+        return pd.DataFrame(columns=columns, index=pd.Index([], name="date"))
+    days = times.astype("datetime64[D]")
+    values = values.astype("float64")
+    in_range = ((values >= 70) & (values <= 180)).astype("float64")
+    # The series is sorted, so every day is one contiguous run of readings.
+    starts = np.flatnonzero(np.concatenate(([True], days[1:] != days[:-1])))
+    readings = np.diff(np.append(starts, len(values)))
+    return pd.DataFrame(
+        {
+            "readings": readings,
+            "mean": np.add.reduceat(values, starts) / readings,
+            "min": np.minimum.reduceat(values, starts),
+            "max": np.maximum.reduceat(values, starts),
+            "time_in_range": np.add.reduceat(in_range, starts) / readings,
+        },
+        index=pd.Index(days[starts], name="date"),
+        columns=columns,
+    )
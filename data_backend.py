@@ -0,0 +1,38 @@
+import os
+
+from firebase_admin import firestore
+
+# "firestore" (the default) uses the Firebase project. "fake" uses the SQLite
+# stand-in in fake_firestore.py, at FAKE_DB_PATH; seed it with seed_fake_db.py.
+DATA_BACKEND = os.environ.get("DATA_BACKEND", "firestore")
+FAKE_DB_PATH = os.environ.get(
+    "FAKE_DB_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".fakedb.sqlite3"),
+)
+
+# Firestore rejects batches with more writes than this.
+MAX_BATCH_WRITES = 500
+
+_fake_clients = {}
+
+
+def get_fake_db(path: str = FAKE_DB_PATH):
+    """Returns the process-wide FakeFirestoreClient for a SQLite file."""
+    from fake_firestore import FakeFirestoreClient
+
+    if path not in _fake_clients:
+        _fake_clients[path] = FakeFirestoreClient(path)
+    return _fake_clients[path]
+
+
+def get_db():
+    """Returns the document database the app reads from and writes to.
+
+    Use this instead of calling ``firestore.client()`` directly, so the app,
+    the seeding tool and the benchmarks can run against the local fake.
+    """
+    if DATA_BACKEND == "fake":
+        return get_fake_db()
+    if DATA_BACKEND != "firestore":
+        raise ValueError(f"Unknown DATA_BACKEND {DATA_BACKEND!r}")
+    return firestore.client()
@@ -0,0 +1,289 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from collections import deque
+from itertools import islice
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+EMBEDDING_CACHE_PATH = os.environ.get(
+    "EMBEDDING_CACHE_PATH",
+    os.path.join(
+        os.path.dirname(os.path.abspath(__file__)), ".embedding_cache.sqlite3"
+    ),
+)
+
+# When the stored vectors outgrow this many bytes, the least recently used
+# ones are evicted down to 90% of it.
+EMBEDDING_CACHE_MAX_BYTES = int(
+    os.environ.get("EMBEDDING_CACHE_MAX_BYTES", str(512 * 2**20))
+)
+
+# SQLite limits the number of parameters in one statement.
+_LOOKUP_BATCH = 500
+
+# Texts per embed_documents call when streaming through embeddings that
+# can not take a stream themselves.
+_STREAM_BATCH = 256
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS vectors (
+    key TEXT PRIMARY KEY,
+    model TEXT NOT NULL,
+    vector BLOB NOT NULL,
+    last_used REAL NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS vectors_last_used ON vectors (last_used);
+"""
+
+
+def model_name(embeddings) -> str:
+    """The name of the model behind a LangChain embeddings object."""
+    for attribute in ("model", "model_name"):
+        name = getattr(embeddings, attribute, None)
+        if isinstance(name, str) and name:
+            return name
+    return type(embeddings).__name__
+
+
+class CachedEmbeddings(Embeddings):
+    """Any LangChain embeddings, with the vectors it computed kept on disk.
+
+    Vectors are stored as float32 in a SQLite file, keyed on the sha256 of
+    the model name and the text, so the same chunk embedded again by any
+    page, process or rebuild of a collection is a lookup. Only the texts
+    that miss are sent to the wrapped embeddings, in one call.
+
+    Args:
+        embeddings (Embeddings): The embeddings to wrap.
+        path (str): The SQLite cache file, shared by every model.
+        max_bytes (int): Size of the stored vectors that triggers eviction
+            of the least recently used ones.
+        cache_queries (bool): Also cache embed_query, e.g. for repeated
+            questions.
+    """
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        path: str = EMBEDDING_CACHE_PATH,
+        max_bytes: int = EMBEDDING_CACHE_MAX_BYTES,
+        cache_queries: bool = True,
+    ):
+        self.embeddings = embeddings
+        self.model = model_name(embeddings)
+        self.path = path
+        self.max_bytes = max_bytes
+        self.cache_queries = cache_queries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.executescript(_SCHEMA)
+        self._bytes = self._connection.execute(
+            "SELECT COALESCE(SUM(LENGTH(vector)), 0) FROM vectors"
+        ).fetchone()[0]
+
+    def _key(self, text: str) -> str:
+        return hashlib.sha256(f"{self.model}\x1f{text}".encode("utf-8")).hexdigest()
+
+    def _lookup(self, keys: list) -> dict:
+        found = {}
+        now = time.time()
+        with self._lock:
+            for start in range(0, len(keys), _LOOKUP_BATCH):
+                chunk = keys[start : start + _LOOKUP_BATCH]
+                rows = self._connection.execute(
+                    "SELECT key, vector FROM vectors WHERE key IN "
+                    f"({','.join('?' * len(chunk))})",
+                    chunk,
+                ).fetchall()
+                found.update(
+                    (key, np.frombuffer(vector, dtype="float32").tolist())
+                    for key, vector in rows
+                )
+            with self._connection:
+                self._connection.executemany(
+                    "UPDATE vectors SET last_used = ? WHERE key = ?",
+                    [(now, key) for key in found],
+                )
+        return found
+
+    def _store(self, vectors: dict) -> None:
+        now = time.time()
+        rows = [
+            (key, self.model, np.asarray(vector, dtype="float32").tobytes(), now)
+            for key, vector in vectors.items()
+        ]
+        with self._lock, self._connection:
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO vectors (key, model, vector, last_used) "
+                "VALUES (?, ?, ?, ?)",
+                rows,
+            )
+            self._bytes += sum(len(row[2]) for row in rows)
+            if self._bytes > self.max_bytes:
+                self._evict()
+
+    def _evict(self) -> None:
+        # The running total drifts when other processes share the file or a
+        # vector is replaced, so recount before throwing anything away.
+        size = self._connection.execute(
+            "SELECT COALESCE(SUM(LENGTH(vector)), 0) FROM vectors"
+        ).fetchone()[0]
+        target = int(self.max_bytes * 0.9)
+        evicted = []
+        for key, length in self._connection.execute(
+            "SELECT key, LENGTH(vector) FROM vectors ORDER BY last_used"
+        ):
+            if size <= target:
+                break
+            evicted.append((key,))
+            size -= length
+        self._connection.executemany("DELETE FROM vectors WHERE key = ?", evicted)
+        self._bytes = size
+
+    def embed_documents(self, texts: list) -> list:
+        keys = [self._key(text) for text in texts]
+        vectors = self._lookup(list(dict.fromkeys(keys)))
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in vectors:
+                missing.setdefault(key, text)
+        with self._lock:
+            self.hits += len(texts) - len(missing)
+            self.misses += len(missing)
+        if missing:
+            computed = self.embeddings.embed_documents(list(missing.values()))
+            new_vectors = dict(zip(missing, computed))
+            self._store(new_vectors)
+            vectors.update(new_vectors)
+        return [vectors[key] for key in keys]
+
+    def embed_stream(self, texts):
+        """Yield the vector of every text of an iterable, in order.
+
+        The texts are looked up _LOOKUP_BATCH at a time, and the misses of
+        the whole stream go to the wrapped embeddings as one stream (see
+        embed_stream), so a parallel FastEmbed model starts its workers once.
+        """
+        # The looked-up chunks whose vectors were not yielded yet, oldest
+        # first. The wrapped embeddings read ahead, so several can wait.
+        chunks = deque()
+
+        def misses():
+            iterator = iter(texts)
+            while chunk := list(islice(iterator, _LOOKUP_BATCH)):
+                keys = [self._key(text) for text in chunk]
+                found = self._lookup(list(dict.fromkeys(keys)))
+                missing = {}
+                for key, text in zip(keys, chunk):
+                    if key not in found:
+                        missing.setdefault(key, text)
+                with self._lock:
+                    self.hits += len(chunk) - len(missing)
+                    self.misses += len(missing)
+                chunks.append((keys, found))
+                yield from missing.values()
+
+        computed = embed_stream(self.embeddings, misses())
+        try:
+            vector = None
+            while True:
+                if not chunks:
+                    # Asking for the next vector reads the next chunks.
+                    vector = next(computed, None)
+                    if not chunks:
+                        return
+                keys, found = chunks.popleft()
+                new_vectors = {}
+                for key in keys:
+                    if key not in found:
+                        if vector is None:
+                            vector = next(computed)
+                        found[key] = new_vectors[key] = vector
+                        vector = None
+                if new_vectors:
+                    self._store(new_vectors)
+                yield from (found[key] for key in keys)
+        finally:
+            computed.close()
+
+    def embed_query(self, text: str) -> list:
+        if not self.cache_queries:
+            return self.embeddings.embed_query(text)
+        # Keyed apart from documents: some models embed queries differently.
+        key = self._key(f"query\x1f{text}")
+        vector = self._lookup([key]).get(key)
+        with self._lock:
+            if vector is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        if vector is None:
+            vector = self.embeddings.embed_query(text)
+            self._store({key: vector})
+        return vector
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def stats(self) -> dict:
+        """Hits, misses and hit rate of this wrapper, and the cache file size."""
+        return {
+            "model": self.model,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hit_rate,
+            "bytes": self._bytes,
+        }
+
+
+def embed_stream(embeddings, texts):
+    """Yield the vector of every text of an iterable, in order.
+
+    A parallel FastEmbed model starts a pool of worker processes, each
+    loading the ONNX model, in every call, so the whole stream goes to one
+    call of the model behind LangChain's FastEmbedEmbeddings. Other
+    embeddings get embed_documents calls of _STREAM_BATCH texts, which is
+    logged, since a parallel model would start its pool for each of them.
+
+    Args:
+        embeddings (Embeddings): A CachedEmbeddings, FastEmbedEmbeddings or
+            any other LangChain embeddings.
+        texts: An iterable of texts, read as the vectors are needed.
+    """
+    if isinstance(embeddings, CachedEmbeddings):
+        yield from embeddings.embed_stream(texts)
+        return
+    # langchain-community keeps the FastEmbed model on ``_model`` or, in
+    # some releases, on ``model``.
+    model = getattr(embeddings, "_model", None) or getattr(embeddings, "model", None)
+    if hasattr(model, "passage_embed"):
+        embed = (
+            model.passage_embed
+            if getattr(embeddings, "doc_embed_type", None) == "passage"
+            else model.embed
+        )
+        vectors = embed(
+            texts, batch_size=embeddings.batch_size, parallel=embeddings.parallel
+        )
+        try:
+            for vector in vectors:
+                yield vector.tolist()
+        finally:
+            vectors.close()
+        return
+    print(
+        f"{type(embeddings).__name__} has no FastEmbed model to stream to, "
+        f"embedding {_STREAM_BATCH} texts per call"
+    )
+    iterator = iter(texts)
+    while batch := list(islice(iterator, _STREAM_BATCH)):
+        yield from embeddings.embed_documents(batch)
@@ -0,0 +1,242 @@
+"""A local stand-in for the Firestore client, backed by SQLite.
+
+It implements the part of the google-cloud-firestore API this app uses:
+``collection()``, ``where(filter=FieldFilter(...))``, ``limit()``,
+``stream()``, ``document()``, ``add()``, ``set()``, ``delete()`` and
+``batch()``. Every document is one row of a ``documents`` table with its
+fields stored as JSON, and filters run in SQL through ``json_extract``.
+Login.py can then be benchmarked and regression-tested without the
+Firebase project (see data_backend.py, seed_fake_db.py and
+benchmark_login.py).
+"""
+
+import json
+import sqlite3
+import threading
+import uuid
+from datetime import datetime, timezone
+
+from data_backend import MAX_BATCH_WRITES
+
+_OPERATORS = {"==": "=", "!=": "!=", "<": "<", "<=": "<=", ">": ">", ">=": ">="}
+
+# Fields the app filters on, indexed like Firestore's automatic single-field indexes.
+_INDEXED_FIELDS = ("userid", "userID", "email")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    collection TEXT NOT NULL,
+    id TEXT NOT NULL,
+    data TEXT NOT NULL,
+    PRIMARY KEY (collection, id)
+) WITHOUT ROWID;
+"""
+
+
+def _field_expression(field_path: str) -> str:
+    # Field names such as "BloodSugarLevel(mg/dl)" have to be quoted in the JSON path.
+    return "json_extract(data, '$.\"{}\"')".format(field_path.replace('"', '""'))
+
+
+class FakeDocumentSnapshot:
+    def __init__(self, reference, data):
+        self.reference = reference
+        self.id = reference.id
+        self._data = data
+        # The fake does not keep track of when documents were created.
+        self.create_time = None
+
+    @property
+    def exists(self) -> bool:
+        return self._data is not None
+
+    def to_dict(self):
+        return None if self._data is None else dict(self._data)
+
+    def get(self, field_path: str):
+        return self._data.get(field_path)
+
+
+class FakeDocumentReference:
+    def __init__(self, client, collection_name: str, document_id: str):
+        self._client = client
+        self.collection_name = collection_name
+        self.id = document_id
+
+    def get(self) -> FakeDocumentSnapshot:
+        rows = self._client._query(
+            "SELECT data FROM documents WHERE collection = ? AND id = ?",
+            (self.collection_name, self.id),
+        )
+        return FakeDocumentSnapshot(self, json.loads(rows[0][0]) if rows else None)
+
+    def set(self, document_data: dict, merge: bool = False) -> None:
+        if merge:
+            current = self.get().to_dict() or {}
+            document_data = {**current, **document_data}
+        self._client._write([(self.collection_name, self.id, document_data)])
+
+    def delete(self) -> None:
+        self._client._write([], [(self.collection_name, self.id)])
+
+
+class FakeQuery:
+    def __init__(self, client, collection_name: str, filters=(), limit=None):
+        self._client = client
+        self.collection_name = collection_name
+        self._filters = tuple(filters)
+        self._limit = limit
+
+    def where(self, field_path=None, op_string=None, value=None, *, filter=None):
+        if filter is not None:
+            field_path, op_string, value = (
+                filter.field_path,
+                filter.op_string,
+                filter.value,
+            )
+        if op_string not in _OPERATORS:
+            raise ValueError(f"Operator {op_string!r} is not supported by the fake")
+        return FakeQuery(
+            self._client,
+            self.collection_name,
+            self._filters + ((field_path, op_string, value),),
+            self._limit,
+        )
+
+    def limit(self, count: int):
+        return FakeQuery(self._client, self.collection_name, self._filters, count)
+
+    def stream(self):
+        sql = "SELECT id, data FROM documents WHERE collection = ?"
+        params = [self.collection_name]
+        for field_path, op_string, value in self._filters:
+            sql += f" AND {_field_expression(field_path)} {_OPERATORS[op_string]} ?"
+            params.append(value)
+        if self._limit is not None:
+            sql += " LIMIT ?"
+            params.append(self._limit)
+        for document_id, data in self._client._query(sql, params):
+            reference = FakeDocumentReference(
+                self._client, self.collection_name, document_id
+            )
+            yield FakeDocumentSnapshot(reference, json.loads(data))
+
+    def get(self):
+        return list(self.stream())
+
+
+class FakeCollectionReference(FakeQuery):
+    def document(self, document_id: str = None) -> FakeDocumentReference:
+        return FakeDocumentReference(
+            self._client, self.collection_name, document_id or uuid.uuid4().hex[:20]
+        )
+
+    def add(self, document_data: dict, document_id: str = None):
+        reference = self.document(document_id)
+        reference.set(document_data)
+        return datetime.now(timezone.utc), reference
+
+
+class FakeWriteBatch:
+    """Collects writes and applies them in one SQLite transaction on commit()."""
+
+    def __init__(self, client):
+        self._client = client
+        self._writes = []
+        self._deletes = []
+
+    def __len__(self) -> int:
+        return len(self._writes) + len(self._deletes)
+
+    def _check_size(self) -> None:
+        if len(self) >= MAX_BATCH_WRITES:
+            raise ValueError(f"A batch holds at most {MAX_BATCH_WRITES} writes")
+
+    def set(self, reference, document_data: dict, merge: bool = False):
+        self._check_size()
+        if merge:
+            current = reference.get().to_dict() or {}
+            document_data = {**current, **document_data}
+        self._writes.append((reference.collection_name, reference.id, document_data))
+        return self
+
+    def delete(self, reference):
+        self._check_size()
+        self._deletes.append((reference.collection_name, reference.id))
+        return self
+
+    def commit(self):
+        self._client._write(self._writes, self._deletes)
+        self._writes, self._deletes = [], []
+
+
+class FakeFirestoreClient:
+    """Drop-in replacement for ``firestore.client()`` backed by one SQLite file.
+
+    Args:
+        path (str): The SQLite database file, or ":memory:" for a private
+            in-memory database.
+    """
+
+    def __init__(self, path: str = ":memory:"):
+        self.path = path
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+        # A private in-memory database only exists on one connection.
+        self._shared = None
+        if path == ":memory:":
+            self._shared = sqlite3.connect(path, check_same_thread=False)
+        connection = self._connection()
+        connection.executescript(_SCHEMA)
+        for number, field_path in enumerate(_INDEXED_FIELDS):
+            connection.execute(
+                f"CREATE INDEX IF NOT EXISTS documents_field{number} "
+                f"ON documents (collection, {_field_expression(field_path)})"
+            )
+        connection.commit()
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._shared is not None:
+            return self._shared
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=30)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
+
+    def _query(self, sql: str, params=()) -> list:
+        if self._shared is not None:
+            with self._write_lock:
+                return self._shared.execute(sql, params).fetchall()
+        return self._connection().execute(sql, params).fetchall()
+
+    def _write(self, writes, deletes=()) -> None:
+        rows = [
+            (collection_name, document_id, json.dumps(document_data, default=str))
+            for collection_name, document_id, document_data in writes
+        ]
+        with self._write_lock:
+            connection = self._connection()
+            with connection:
+                connection.executemany(
+                    "INSERT OR REPLACE INTO documents (collection, id, data) "
+                    "VALUES (?, ?, ?)",
+                    rows,
+                )
+                connection.executemany(
+                    "DELETE FROM documents WHERE collection = ? AND id = ?", deletes
+                )
+
+    def collection(self, collection_name: str) -> FakeCollectionReference:
+        return FakeCollectionReference(self, collection_name)
+
+    def batch(self) -> FakeWriteBatch:
+        return FakeWriteBatch(self)
+
+    def count(self, collection_name: str) -> int:
+        """Number of documents in a collection (not part of the Firestore API)."""
+        return self._query(
+            "SELECT COUNT(*) FROM documents WHERE collection = ?", (collection_name,)
+        )[0][0]
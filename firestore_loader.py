@@ -0,0 +1,330 @@
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import pandas as pd
+from firebase_admin import firestore
+from google.api_core.exceptions import FailedPrecondition
+
+from frame_builder import FrameBuilder
+from timeseries import TimeSeries
+
+# Collection name -> (field that holds the owner's userid, field that holds the record date).
+# Posts are written by the SugarGram app, which stores the owner as "userID" and has no date.
+PROFILE_COLLECTIONS = {
+    "bloodsugars": ("userid", "DateTime"),
+    "weights": ("userid", "Date"),
+    "exercises": ("userid", "Date"),
+    "foods": ("userid", "datetime"),
+    "posts": ("userID", None),
+    "sleep": ("userid", "Date"),
+    "water": ("userid", "Date"),
+    "foodunderstanding": ("userid", "Date"),
+}
+
+# Every frame carries the Firestore document id, so a delta can replace the
+# rows of documents that were loaded before.
+ID_COLUMN = "docid"
+
+# The time Firestore created a document, added to every streamed document.
+# Posts have no date of their own, so this is how old they are.
+CREATE_TIME_FIELD = "createTime"
+
+# Collection name -> the session DataFrame columns, as {column: (document field, dtype)}.
+FRAME_COLUMNS = {
+    "bloodsugars": {
+        "DateTime": ("DateTime", "string"),
+        "BloodSugarLevel(mg/dl)": ("BloodSugarLevel(mg/dl)", "float64"),
+        "userid": ("userid", "string"),
+    },
+    "weights": {
+        "Date": ("Date", "string"),
+        "Weight": ("Weight(pounds)", "float64"),
+        "userid": ("userid", "string"),
+    },
+    "exercises": {
+        "Date": ("Date", "string"),
+        "Exercise": ("Exercise", "string"),
+        "Reps": ("Reps", "float64"),
+        "Sets": ("Sets", "float64"),
+    },
+    "foods": {
+        "datetime": ("datetime", "string"),
+        "calories": ("calories", "float64"),
+        "fats": ("fats", "float64"),
+        "carbohydrates": ("carbohydrates", "float64"),
+        "fiber": ("fiber", "float64"),
+        "name": ("name", "string"),
+        "protein": ("protein", "float64"),
+        "sodium": ("sodium", "float64"),
+        "sugar": ("sugar", "float64"),
+        "type": ("type", "string"),
+        "userid": ("userid", "string"),
+        "weight": ("weight", "float64"),
+    },
+    "posts": {
+        "isPostImage": ("isPostImage", "object"),
+        "postImage": ("postImage", "string"),
+        "postVideo": ("postVideo", "string"),
+        "userDisplayName": ("userDisplayName", "string"),
+        "userID": ("userID", "string"),
+        "userMessage": ("userMessage", "string"),
+        "createTime": (CREATE_TIME_FIELD, "datetime64[ns, UTC]"),
+    },
+    "sleep": {
+        "Date": ("Date", "string"),
+        "Sleep": ("Sleep(hours)", "float64"),
+        "userid": ("userid", "string"),
+    },
+    "water": {
+        "Date": ("Date", "string"),
+        "Water": ("Water(ounces)", "float64"),
+        "userid": ("userid", "string"),
+    },
+    "foodunderstanding": {
+        "Date": ("Date", "string"),
+        "CarbohydrateError": ("Water(onces)", "float64"),
+        "userid": ("userid", "string"),
+    },
+}
+
+# Collections of timestamped measurements -> (time column, value column).
+# load_user_frames hands these to the session as a TimeSeries, not a DataFrame.
+TIME_SERIES_COLUMNS = {
+    "bloodsugars": ("DateTime", "BloodSugarLevel(mg/dl)"),
+    "weights": ("Date", "Weight"),
+    "sleep": ("Date", "Sleep"),
+    "water": ("Date", "Water"),
+}
+
+# Session state key -> the collection that Login.py loads into it.
+SESSION_FRAMES = {
+    "glucose_data": "bloodsugars",
+    "weight_data": "weights",
+    "exercise_data": "exercises",
+    "food_data": "foods",
+    "post_data": "posts",
+    "sleep_data": "sleep",
+    "water_data": "water",
+    "foodunderstanding_data": "foodunderstanding",
+}
+
+
+class ReadCounter:
+    """Counts the Firestore documents read per collection.
+
+    Firestore bills one read per document returned by a query, so the counts
+    are what a login costs. Login keeps them in ``st.session_state.read_counter``.
+    """
+
+    def __init__(self):
+        self.counts = Counter()
+        self._lock = threading.Lock()
+
+    def add(self, collection_name: str, reads: int = 1) -> None:
+        with self._lock:
+            self.counts[collection_name] += reads
+
+    @property
+    def total(self) -> int:
+        return sum(self.counts.values())
+
+    def as_dict(self) -> dict:
+        return dict(self.counts)
+
+
+def user_query(db, collection_name: str, userid: str, start=None, end=None):
+    """Build a query that only matches the documents owned by one user.
+
+    Args:
+        db: The Firestore client.
+        collection_name (str): One of the keys of PROFILE_COLLECTIONS.
+        userid (str): The id of the logged-in user.
+        start: Optional inclusive lower bound on the record date.
+        end: Optional exclusive upper bound on the record date.
+
+    Returns:
+        A Firestore query. Date windows on top of the userid filter need the
+        composite indexes (userid + date field) in firestore.indexes.json;
+        without them streaming the query raises FailedPrecondition.
+    """
+    user_field, date_field = PROFILE_COLLECTIONS[collection_name]
+    query = db.collection(collection_name).where(
+        filter=firestore.FieldFilter(user_field, "==", userid)
+    )
+    if date_field is not None:
+        if start is not None:
+            query = query.where(filter=firestore.FieldFilter(date_field, ">=", start))
+        if end is not None:
+            query = query.where(filter=firestore.FieldFilter(date_field, "<", end))
+    elif start is not None or end is not None:
+        raise ValueError(f"{collection_name} has no date field to window on")
+    return query
+
+
+def stream_user_documents(
+    db, collection_name: str, userid: str, start=None, end=None, read_counter=None
+):
+    """Yield ``(document id, document dict)`` for one user's documents.
+
+    The userid filter (and the optional date window) runs inside Firestore,
+    so only the user's own documents are sent over the wire and billed. The
+    document's create time is added as CREATE_TIME_FIELD.
+    """
+    for doc in user_query(db, collection_name, userid, start, end).stream():
+        if read_counter is not None:
+            read_counter.add(collection_name)
+        yield doc.id, {**doc.to_dict(), CREATE_TIME_FIELD: doc.create_time}
+
+
+def load_user_frame(
+    db, collection_name: str, userid: str, start=None, end=None, read_counter=None
+):
+    """Load one user's documents from a profile collection into a DataFrame.
+
+    Args:
+        db: The Firestore client.
+        collection_name (str): One of the keys of PROFILE_COLLECTIONS.
+        userid (str): The id of the logged-in user.
+        start: Optional inclusive lower bound on the record date.
+        end: Optional exclusive upper bound on the record date.
+        read_counter (ReadCounter): Optional counter for the documents read.
+
+    Returns:
+        pd.DataFrame: The columns of FRAME_COLUMNS[collection_name], typed.
+    """
+    builder = FrameBuilder(
+        {ID_COLUMN: (ID_COLUMN, "string"), **FRAME_COLUMNS[collection_name]}
+    )
+    for docid, document in stream_user_documents(
+        db, collection_name, userid, start, end, read_counter
+    ):
+        builder.append({**document, ID_COLUMN: docid})
+    return builder.build()
+
+
+def sync_user_frame(db, collection_name: str, userid: str, snapshot, read_counter=None):
+    """Load one user's collection, reading only what changed since the snapshot.
+
+    With a snapshot on disk, only the documents dated at or after its
+    high-water mark are read. They replace the snapshot rows with the same
+    document id and are appended otherwise. Without a snapshot (or for posts,
+    which have no date) the collection is loaded in full, and so it is when
+    the Firebase project lacks the delta query's index. Either way the
+    result is written back as the new snapshot.
+
+    Args:
+        db: The Firestore client.
+        collection_name (str): One of the keys of PROFILE_COLLECTIONS.
+        userid (str): The id of the logged-in user.
+        snapshot (UserSnapshot): The user's on-disk snapshot.
+        read_counter (ReadCounter): Optional counter for the documents read.
+
+    Returns:
+        pd.DataFrame: Same columns as load_user_frame.
+    """
+    date_field = PROFILE_COLLECTIONS[collection_name][1]
+    date_column = next(
+        (
+            column
+            for column, (field, _) in FRAME_COLUMNS[collection_name].items()
+            if field == date_field
+        ),
+        None,
+    )
+    cached, state = snapshot.load(collection_name)
+
+    frame = None
+    if (
+        cached is not None
+        and date_column is not None
+        and state["high_water_mark"] is not None
+    ):
+        try:
+            delta = load_user_frame(
+                db,
+                collection_name,
+                userid,
+                start=state["high_water_mark"],
+                read_counter=read_counter,
+            )
+        except FailedPrecondition as e:
+            # The userid + date index is missing, see firestore.indexes.json.
+            print(f"Loading all of {collection_name}, its delta query failed: {e}")
+        else:
+            if len(delta) == 0:
+                return cached
+            frame = pd.concat(
+                [cached[~cached[ID_COLUMN].isin(delta[ID_COLUMN])], delta],
+                ignore_index=True,
+            )
+    if frame is None:
+        frame = load_user_frame(db, collection_name, userid, read_counter=read_counter)
+        state = {"full_load_at": time.time()}
+
+    state["high_water_mark"] = (
+        frame[date_column].max()
+        if date_column and frame[date_column].notna().any()
+        else None
+    )
+    snapshot.save(collection_name, frame, state)
+    return frame
+
+
+def _timed_load_user_frame(db, collection_name, userid, read_counter, snapshot):
+    started = time.perf_counter()
+    if snapshot is None:
+        frame = load_user_frame(db, collection_name, userid, read_counter=read_counter)
+    else:
+        frame = sync_user_frame(
+            db, collection_name, userid, snapshot, read_counter=read_counter
+        )
+    if collection_name in TIME_SERIES_COLUMNS:
+        frame = TimeSeries.from_frame(frame, *TIME_SERIES_COLUMNS[collection_name])
+    return frame, time.perf_counter() - started
+
+
+def load_user_frames(
+    db, userid: str, session_frames: dict, read_counter=None, snapshot=None
+):
+    """Load several profile collections at the same time.
+
+    Every collection gets its own worker thread, so login waits for the
+    slowest collection instead of the sum of all of them. The Firestore client
+    is thread-safe and shares one gRPC channel between the workers.
+
+    Args:
+        db: The Firestore client.
+        userid (str): The id of the logged-in user.
+        session_frames (dict): Session state key -> collection name, usually a
+            subset of SESSION_FRAMES.
+        read_counter (ReadCounter): Optional counter for the documents read.
+        snapshot (UserSnapshot): Optional on-disk snapshot. When given, each
+            collection is synced with sync_user_frame instead of loaded in full.
+
+    Yields:
+        tuple: ``(session key, data, seconds)`` in the order the collections
+        finish loading, so callers can use each one as soon as it arrives.
+        ``data`` is a TimeSeries for the collections in TIME_SERIES_COLUMNS
+        and a DataFrame for the others.
+    """
+    if not session_frames:
+        return
+    with ThreadPoolExecutor(
+        max_workers=len(session_frames), thread_name_prefix="profile-loader"
+    ) as executor:
+        futures = {
+            executor.submit(
+                _timed_load_user_frame,
+                db,
+                collection_name,
+                userid,
+                read_counter,
+                snapshot,
+            ): key
+            for key, collection_name in session_frames.items()
+        }
+        for future in as_completed(futures):
+            frame, seconds = future.result()
+            yield futures[future], frame, seconds
@@ -0,0 +1,44 @@
+import pandas as pd
+
+
+class FrameBuilder:
+    """Collects records into column buffers and builds one DataFrame at the end.
+
+    Appending a record is a handful of list appends, so loading n documents is
+    linear in n. The frame is allocated once, with an explicit dtype per
+    column, instead of concatenating a one-row frame per document.
+
+    Args:
+        columns (dict): Frame column name -> (record field, dtype). The dtypes
+            are pandas dtype names; "float64" columns are parsed with
+            ``pd.to_numeric`` so numbers stored as strings become numbers and
+            anything unparsable becomes NaN.
+    """
+
+    def __init__(self, columns: dict):
+        self.columns = columns
+        self._buffers = {name: [] for name in columns}
+
+    def __len__(self) -> int:
+        return len(next(iter(self._buffers.values()), []))
+
+    def append(self, record: dict) -> None:
+        for name, (field, _) in self.columns.items():
+            self._buffers[name].append(record.get(field))
+
+    def extend(self, records) -> "FrameBuilder":
+        for record in records:
+            self.append(record)
+        return self
+
+    def build(self) -> pd.DataFrame:
+        data = {}
+        for name, (_, dtype) in self.columns.items():
+            values = self._buffers[name]
+            if dtype == "float64":
+                data[name] = pd.to_numeric(
+                    pd.Series(values, dtype="object"), errors="coerce"
+                ).astype("float64")
+            else:
+                data[name] = pd.Series(values, dtype=dtype)
+        return pd.DataFrame(data, columns=list(self.columns))
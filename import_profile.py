@@ -0,0 +1,115 @@
+"""Report what each Streamlit page's imports cost on a cold start.
+
+Runs the module-level imports of Login.py and every page in a fresh
+interpreter with ``python -X importtime`` and lists the slowest top-level
+modules, so a page that pulls in Langflow or LangChain at import shows up.
+The page code itself is not run. Modules declared with lazy_import (see
+lazy_imports.py) are not imported until used, so they do not count here:
+
+    python import_profile.py
+    python import_profile.py --top 5 pages/1*
+"""
+
+import argparse
+import ast
+import glob
+import os
+import re
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+_IMPORT_TIME = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \| (\s*)(\S+)$")
+
+
+def page_paths() -> list:
+    return [os.path.join(ROOT, "Login.py")] + sorted(
+        glob.glob(os.path.join(ROOT, "pages", "*.py"))
+    )
+
+
+def module_imports(path: str) -> list:
+    """The source of the import statements a module runs when it is imported."""
+    with open(path, encoding="utf-8") as f:
+        tree = ast.parse(f.read(), filename=path)
+    imports = []
+    nodes = list(tree.body)
+    while nodes:
+        node = nodes.pop(0)
+        if isinstance(node, (ast.Import, ast.ImportFrom)):
+            imports.append(ast.unparse(node))
+        elif isinstance(node, ast.Try):
+            nodes[:0] = node.body
+    return imports
+
+
+def _run_importtime(script: str) -> subprocess.CompletedProcess:
+    return subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", script],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+    )
+
+
+def _import_times(stderr: str) -> dict:
+    modules = {}
+    for line in stderr.splitlines():
+        match = _IMPORT_TIME.match(line)
+        # Nested imports are indented under the module that triggered them.
+        if match and not match.group(3):
+            modules[match.group(4)] = int(match.group(2)) / 1e6
+    return modules
+
+
+def profile_imports(imports: list) -> dict:
+    """Import statements in a fresh interpreter and time every module.
+
+    An import that fails (e.g. a package that is not installed) is reported
+    and skipped, so the rest are still timed.
+
+    Returns:
+        dict: "modules" (top-level module -> cumulative seconds), "total"
+        seconds and "failed" (statement -> error).
+    """
+    script = "\n".join(
+        f"try:\n    {statement}\n"
+        f"except Exception as e:\n    print({statement!r}, '->', repr(e))"
+        for statement in imports
+    )
+    completed = _run_importtime(script)
+    # Leave out what the interpreter imports on its own at startup.
+    startup = _import_times(_run_importtime("pass").stderr)
+    modules = {
+        name: seconds
+        for name, seconds in _import_times(completed.stderr).items()
+        if name not in startup
+    }
+    failed = dict(
+        line.split(" -> ", 1)
+        for line in completed.stdout.splitlines()
+        if " -> " in line
+    )
+    return {"modules": modules, "total": sum(modules.values()), "failed": failed}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("pages", nargs="*", help="pages to profile (default: all)")
+    parser.add_argument("--top", type=int, default=10, help="modules to list per page")
+    args = parser.parse_args()
+
+    paths = [path for pattern in args.pages for path in glob.glob(pattern)]
+    for path in paths or page_paths():
+        report = profile_imports(module_imports(path))
+        print(f"{os.path.relpath(path, ROOT)}: {report['total']:.2f}s of imports")
+        slowest = sorted(report["modules"].items(), key=lambda item: -item[1])
+        for name, seconds in slowest[: args.top]:
+            print(f"  {seconds * 1000:8.1f} ms  {name}")
+        for statement, error in report["failed"].items():
+            print(f"  failed: {statement} ({error})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,248 @@
+import json
+import os
+import socket
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+from ingestion import CollectionManifest, clear_collection, sync_collection
+
+# How often a session waiting for another builder checks on it.
+INGEST_POLL_SECONDS = float(os.environ.get("INGEST_POLL_SECONDS", "1"))
+
+# A builder renews its lease a few times within this; a lease that was not
+# renewed for this long belongs to a builder that died, and is taken over.
+INGEST_LEASE_SECONDS = float(os.environ.get("INGEST_LEASE_SECONDS", "120"))
+
+
+class IngestCoordinator:
+    """Lets one builder at a time work on a collection.
+
+    A thread lock keeps out the other sessions of this process. Other
+    processes, e.g. a second app replica or ``python ingestion.py``, share
+    nothing but the Chroma server, so the builder also holds a lease there:
+    the collection ``<collection>-ingest-lock``, which only one client can
+    create. Its metadata carries the builder's progress, which everyone else
+    polls until the builder is done, and a heartbeat. A lease whose
+    heartbeat is older than ``lease_seconds`` belongs to a builder that
+    crashed, so the next session takes over.
+
+    Args:
+        client: The Chroma client.
+        collection_name (str): The Chroma collection.
+        lease_seconds (float): How long a lease outlives its last heartbeat.
+    """
+
+    def __init__(
+        self,
+        client,
+        collection_name: str,
+        lease_seconds: float = INGEST_LEASE_SECONDS,
+    ):
+        self.client = client
+        self.collection_name = collection_name
+        self.lock_name = f"{collection_name}-ingest-lock"
+        self.lease_seconds = lease_seconds
+        self.holder = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._lock = threading.Lock()
+        self._lease = None
+        self._status = {}
+        self._status_lock = threading.Lock()
+
+    @contextmanager
+    def in_process(self):
+        """Try to keep out the other sessions of this process, without waiting.
+
+        Unlike exclusive it does not ask the Chroma server, so it is cheap
+        enough for every rerun.
+
+        Yields:
+            bool: True while no other session of this process is building.
+        """
+        if not self._lock.acquire(blocking=False):
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            self._lock.release()
+
+    @contextmanager
+    def exclusive(self):
+        """Try to become the collection's builder, without waiting.
+
+        Yields:
+            bool: True while this caller holds the thread lock and the lease.
+        """
+        with self.in_process() as free:
+            if not free or not self._acquire_lease():
+                yield False
+                return
+            stop = threading.Event()
+            heartbeat = threading.Thread(
+                target=self._heartbeat, args=(stop,), daemon=True
+            )
+            heartbeat.start()
+            try:
+                yield True
+            finally:
+                stop.set()
+                heartbeat.join()
+                self._release_lease()
+
+    def _lease_metadata(self) -> dict:
+        return {
+            "holder": self.holder,
+            "heartbeat_at": time.time(),
+            "status": json.dumps(self._status),
+        }
+
+    def _acquire_lease(self) -> bool:
+        self._status = {}
+        try:
+            self._lease = self.client.create_collection(
+                self.lock_name,
+                metadata=self._lease_metadata(),
+                embedding_function=None,
+            )
+            return True
+        except Exception as e:
+            try:
+                lease = self.client.get_collection(
+                    self.lock_name, embedding_function=None
+                )
+            except Exception:
+                # No one holds it, so the create failed for another reason.
+                raise e
+        metadata = lease.metadata or {}
+        if time.time() - metadata.get("heartbeat_at", 0) > self.lease_seconds:
+            print(
+                f"Taking over the {self.collection_name} build from "
+                f"{metadata.get('holder')}, its lease expired"
+            )
+            self._delete_lease(metadata.get("holder"))
+        return False
+
+    def _delete_lease(self, holder: str) -> None:
+        """Delete the lease if ``holder`` still has it.
+
+        Chroma has no compare-and-delete, so the check and the delete are two
+        requests. Two sessions taking over the same expired lease at once can
+        race: if one of them deletes it and creates its own between the
+        other's check and delete, the other deletes the new lease too, and
+        both build. The window is one round trip once every lease_seconds,
+        and sync_collection only redoes files when that happens.
+        """
+        try:
+            lease = self.client.get_collection(self.lock_name, embedding_function=None)
+            if (lease.metadata or {}).get("holder") == holder:
+                self.client.delete_collection(self.lock_name)
+        except Exception as e:
+            print(f"Could not release the {self.collection_name} lease: {e}")
+
+    def _release_lease(self) -> None:
+        with self._status_lock:
+            self._lease = None
+        self._delete_lease(self.holder)
+
+    def _heartbeat(self, stop: threading.Event) -> None:
+        while not stop.wait(self.lease_seconds / 4):
+            self._renew()
+
+    def _renew(self) -> None:
+        with self._status_lock:
+            if self._lease is None:
+                return
+            try:
+                self._lease.modify(metadata=self._lease_metadata())
+            except Exception as e:
+                print(f"Could not renew the {self.collection_name} lease: {e}")
+
+    def write_status(self, **status) -> None:
+        """Publish the builder's progress to everyone waiting for it."""
+        status.update(
+            collection=self.collection_name,
+            host=socket.gethostname(),
+            pid=os.getpid(),
+            updated_at=time.time(),
+        )
+        with self._status_lock:
+            self._status = status
+        self._renew()
+
+    def read_status(self) -> dict:
+        """The current builder's progress, or {} when no one is building."""
+        try:
+            lease = self.client.get_collection(self.lock_name, embedding_function=None)
+            return json.loads((lease.metadata or {}).get("status") or "{}")
+        except Exception:
+            return {}
+
+    def run(self, build, progress=None, poll_seconds: float = INGEST_POLL_SECONDS):
+        """Run ``build()`` as the collection's builder, once no one else is.
+
+        While another session or process builds the collection, its status
+        is passed to ``progress`` with ``"waiting": True`` every
+        ``poll_seconds``. The build runs after that one finished, so it
+        should only do what is still left to do (see
+        ingestion.sync_collection).
+
+        Returns:
+            Whatever ``build`` returns.
+        """
+        while True:
+            with self.exclusive() as builder:
+                if builder:
+                    return build()
+            if progress is not None:
+                progress({**self.read_status(), "waiting": True})
+            time.sleep(poll_seconds)
+
+
+def coordinated_sync(
+    coordinator: IngestCoordinator,
+    embeddings,
+    directory: str,
+    kind: str,
+    progress=None,
+    rebuild: bool = False,
+) -> tuple:
+    """Sync a collection (see ingestion.sync_collection) as its only builder.
+
+    Args:
+        coordinator (IngestCoordinator): The collection's coordinator.
+        embeddings (Embeddings): Embeds the documents' text.
+        directory (str): The source files' directory.
+        kind (str): "csv" or "pdf".
+        progress (callable): Gets this sync's stats, or another builder's
+            status with ``"waiting": True`` while waiting for it.
+        rebuild (bool): Delete every chunk and embed every file again.
+
+    Returns:
+        tuple: The sync's results and the collection's manifest after it.
+    """
+
+    def report(stats):
+        if not stats.get("waiting"):
+            coordinator.write_status(state="building", **stats)
+        if progress is not None:
+            progress(stats)
+
+    def build():
+        # Fetch both under the lock: the last builder may have just recorded
+        # its files, and a collection's metadata is read when it is fetched.
+        collection = coordinator.client.get_or_create_collection(
+            coordinator.collection_name, embedding_function=None
+        )
+        manifest = CollectionManifest(coordinator.collection_name)
+        if rebuild:
+            clear_collection(collection, manifest)
+        coordinator.write_status(state="building")
+        results = sync_collection(
+            collection, embeddings, directory, kind, manifest, progress=report
+        )
+        coordinator.write_status(state="done", results=results)
+        return results, manifest
+
+    return coordinator.run(build, progress=report)
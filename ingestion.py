@@ -0,0 +1,482 @@
+"""Keep a persona page's Chroma collection in step with its source files.
+
+Every collection has a manifest with the hash and chunk ids of each source
+file, so only new or changed files are embedded again and the chunks of
+removed files are deleted. The hashes are recorded in the collection's
+metadata on the Chroma server, and every chunk names its file, so an app
+container without the local manifest (a fresh deploy, another replica)
+rebuilds it from Chroma instead of embedding everything again.
+
+The loaders are generators, so a file is never held in memory as a whole:
+each file's documents go to FastEmbed as one stream, embedded by parallel
+workers that start once per file, and are upserted to Chroma
+INGEST_BATCH_SIZE at a time while the next ones are being embedded.
+Progress, rows per second and peak memory are reported as it goes. Chunk
+ids are derived from their content, so writing a chunk again replaces it,
+and only one builder at a time syncs a collection (see
+ingest_coordinator.py). The persona pages sync their collection when their
+files changed; it can also be run ahead of time:
+
+    python ingestion.py csv documents/chef chef_collection
+    python ingestion.py pdf documents/personaltrainer trainer_collection
+    python ingestion.py csv documents/chef chef_collection --rebuild
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import resource
+import sys
+import time
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+
+from langchain_community.document_loaders import CSVLoader, PyPDFLoader
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+from embedding_cache import embed_stream
+
+# Documents upserted together, and texts per FastEmbed worker task. Bigger
+# batches hold more vectors in memory.
+INGEST_BATCH_SIZE = int(os.environ.get("INGEST_BATCH_SIZE", "256"))
+
+# FastEmbed worker processes for ingestion; 0 uses every core, and 1 (or a
+# single core) embeds in the app's own process.
+INGEST_EMBED_WORKERS = int(os.environ.get("INGEST_EMBED_WORKERS", "0"))
+
+# One manifest per collection, named after it.
+INGEST_MANIFEST_DIRECTORY = os.environ.get(
+    "INGEST_MANIFEST_DIRECTORY",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".ingest_manifests"),
+)
+
+# Chunk metadata: the source file a chunk came from.
+SOURCE_FILE_KEY = "source_file"
+
+# Collection metadata: "sha256:<file name>" -> the hash of the file version
+# whose chunks are all in the collection, next to a marker that keeps the
+# metadata from ever being empty.
+FILE_HASH_PREFIX = "sha256:"
+MANIFEST_MARKER_KEY = "ingest_manifest"
+
+# Ids per Chroma delete call.
+_DELETE_BATCH = 5000
+
+
+def iter_csv_file(filepath: str):
+    """Yield one document per row of a CSV file, with the file name as source."""
+    file = os.path.basename(filepath)
+    for document in CSVLoader(filepath, encoding="utf-8").lazy_load():
+        document.metadata["source"] = file
+        yield document
+
+
+def iter_pdf_file(filepath: str, chunk_size: int = 1024, chunk_overlap: int = 20):
+    """Yield the chunks of a PDF file, a page at a time.
+
+    Args:
+        filepath (str): The PDF file.
+        chunk_size (int): The most characters in a chunk.
+        chunk_overlap (int): Characters shared by neighbouring chunks.
+    """
+    text_splitter = RecursiveCharacterTextSplitter(
+        chunk_size=chunk_size, chunk_overlap=chunk_overlap
+    )
+    for page in PyPDFLoader(filepath).lazy_load():
+        yield from text_splitter.split_documents([page])
+
+
+# Each kind of source: its file extension and how one file is read.
+SOURCES = {"csv": (".csv", iter_csv_file), "pdf": (".pdf", iter_pdf_file)}
+
+
+def source_files(directory: str, kind: str) -> dict:
+    """The files of one kind in a directory, as {file name: path}.
+
+    A missing directory raises FileNotFoundError: taken as empty, it would
+    delete every chunk of the collection.
+    """
+    extension = SOURCES[kind][0]
+    return {
+        filename: os.path.join(directory, filename)
+        for filename in sorted(os.listdir(directory))
+        if filename.lower().endswith(extension)
+    }
+
+
+def batched(iterable, size: int):
+    """Yield lists of ``size`` items, the last one possibly shorter."""
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+def peak_memory_mib() -> float:
+    """The process's peak resident memory so far."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes.
+    return peak / 2**20 if sys.platform == "darwin" else peak / 2**10
+
+
+def chunk_id(document, occurrence: int = 0) -> str:
+    """A chunk's id, derived from its source file's name and its text.
+
+    The same chunk gets the same id every time it is ingested, so writing it
+    again is an idempotent upsert. ``occurrence`` tells apart identical
+    chunks of one file.
+    """
+    source = os.path.basename(str(document.metadata.get("source", "")))
+    digest = hashlib.sha256(
+        f"{source}\x1f{document.page_content}".encode("utf-8")
+    ).hexdigest()[:32]
+    return f"{digest}-{occurrence}" if occurrence else digest
+
+
+def _upsert(collection, ids: list, **fields) -> list:
+    collection.upsert(ids=ids, **fields)
+    return ids
+
+
+def delete_ids(collection, ids: list) -> None:
+    ids = list(ids)
+    for start in range(0, len(ids), _DELETE_BATCH):
+        collection.delete(ids=ids[start : start + _DELETE_BATCH])
+
+
+def recorded_hashes(collection) -> dict:
+    """{file name: sha256} of the files whose chunks are all in the collection."""
+    return {
+        key[len(FILE_HASH_PREFIX) :]: value
+        for key, value in (collection.metadata or {}).items()
+        if key.startswith(FILE_HASH_PREFIX)
+    }
+
+
+def record_hash(collection, filename: str, digest: str = None) -> None:
+    """Record a file's hash in the collection's metadata, or forget it (None)."""
+    # modify replaces the whole metadata, so pass on the other keys.
+    metadata = {**(collection.metadata or {}), MANIFEST_MARKER_KEY: 1}
+    if digest is None:
+        metadata.pop(FILE_HASH_PREFIX + filename, None)
+    else:
+        metadata[FILE_HASH_PREFIX + filename] = digest
+    collection.modify(metadata=metadata)
+
+
+def _from_file(documents, filename: str):
+    for document in documents:
+        document.metadata[SOURCE_FILE_KEY] = filename
+        yield document
+
+
+def ingest_documents(
+    collection,
+    embeddings,
+    documents,
+    batch_size: int = INGEST_BATCH_SIZE,
+    progress=None,
+    written_ids: list = None,
+) -> dict:
+    """Embed documents as one stream and upsert them to Chroma, batch by batch.
+
+    Args:
+        collection: The chromadb collection to write to.
+        embeddings (Embeddings): Embeds the documents' text.
+        documents: An iterable of LangChain Documents, e.g. from
+            iter_csv_file or iter_pdf_file.
+        batch_size (int): Documents upserted together.
+        progress (callable): Called with the stats after every batch.
+        written_ids (list): Gets the id of every document as soon as it is
+            upserted, so a caller can clean up after a failure.
+
+    Returns:
+        dict: "rows" ingested, "seconds", "rows_per_second",
+        "peak_memory_mib" and the documents' "ids".
+    """
+    started = time.perf_counter()
+    if written_ids is None:
+        written_ids = []
+    stats = {"rows": 0, "seconds": 0.0, "rows_per_second": 0.0}
+    occurrences = Counter()
+    # The documents whose text the embeddings read, waiting for their vector.
+    read = deque()
+
+    def read_texts():
+        for document in documents:
+            read.append(document)
+            yield document.page_content
+
+    stream = embed_stream(embeddings, read_texts())
+    # One upsert in flight while the next batch is embedded.
+    with ThreadPoolExecutor(max_workers=1) as writer:
+        pending = None
+        try:
+            for vectors in batched(stream, batch_size):
+                batch = [read.popleft() for _ in vectors]
+                ids = []
+                for document in batch:
+                    digest = chunk_id(document)
+                    ids.append(chunk_id(document, occurrences[digest]))
+                    occurrences[digest] += 1
+                if pending is not None:
+                    written_ids.extend(pending.result())
+                pending = writer.submit(
+                    _upsert,
+                    collection,
+                    ids=ids,
+                    embeddings=vectors,
+                    documents=[document.page_content for document in batch],
+                    metadatas=[document.metadata or None for document in batch],
+                )
+                stats["rows"] += len(batch)
+                stats["seconds"] = time.perf_counter() - started
+                stats["rows_per_second"] = stats["rows"] / stats["seconds"]
+                stats["peak_memory_mib"] = peak_memory_mib()
+                if progress is not None:
+                    progress(stats)
+        finally:
+            # Stops FastEmbed's workers when a file fails half way.
+            stream.close()
+            # Even then the upsert in flight is finished and its ids are
+            # passed on, so the caller can delete them.
+            if pending is not None:
+                written_ids.extend(pending.result())
+    stats["ids"] = written_ids
+    stats["seconds"] = time.perf_counter() - started
+    stats["rows_per_second"] = (
+        stats["rows"] / stats["seconds"] if stats["rows"] else 0.0
+    )
+    stats["peak_memory_mib"] = peak_memory_mib()
+    print(
+        f"Ingested {stats['rows']} rows into {collection.name} in "
+        f"{stats['seconds']:.1f}s ({stats['rows_per_second']:.0f} rows/s, "
+        f"peak memory {stats['peak_memory_mib']:.0f} MiB)"
+    )
+    return stats
+
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(2**20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class CollectionManifest:
+    """The hash and chunk ids of every source file in a collection, as JSON.
+
+    A file's size and modification time are kept too, so a file that was not
+    touched is not hashed again. The JSON file is this container's copy;
+    the collection's recorded hashes are the truth (see reconcile).
+
+    Args:
+        collection_name (str): The Chroma collection.
+        directory (str): Where the manifests are kept.
+    """
+
+    def __init__(
+        self, collection_name: str, directory: str = INGEST_MANIFEST_DIRECTORY
+    ):
+        self.path = os.path.join(directory, f"{collection_name}.json")
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                self.files = json.load(f)
+        except FileNotFoundError:
+            self.files = {}
+
+    def save(self) -> None:
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with open(f"{self.path}.tmp", "w", encoding="utf-8") as f:
+            json.dump(self.files, f, indent=1)
+        os.replace(f"{self.path}.tmp", self.path)
+
+    def reconcile(self, collection) -> None:
+        """Make the manifest agree with the hashes recorded in the collection.
+
+        Entries the collection does not confirm are dropped, so their files
+        are ingested again. Files the collection has but the manifest does
+        not (e.g. after a fresh deploy) get their chunk ids from Chroma; their
+        size and time are unknown, so changes() hashes them once.
+        """
+        hashes = recorded_hashes(collection)
+        for filename in list(self.files):
+            if self.files[filename]["sha256"] != hashes.get(filename):
+                del self.files[filename]
+        for filename, digest in hashes.items():
+            if filename not in self.files:
+                ids = collection.get(where={SOURCE_FILE_KEY: filename}, include=[])
+                self.files[filename] = {
+                    "sha256": digest,
+                    "size": None,
+                    "mtime": None,
+                    "ids": ids["ids"],
+                    "ingested_at": None,
+                }
+
+    def changes(self, files: dict) -> dict:
+        """What a sync has to do to bring the collection up to ``files``.
+
+        Args:
+            files (dict): The source files now, as {file name: path}.
+
+        Returns:
+            dict: "changed" ({file name: (path, sha256)} of new and edited
+            files) and "removed" (names of files that are gone).
+        """
+        changed = {}
+        for filename, path in files.items():
+            status = os.stat(path)
+            entry = self.files.get(filename)
+            if (
+                entry
+                and entry["size"] == status.st_size
+                and entry["mtime"] == status.st_mtime
+            ):
+                continue
+            digest = file_sha256(path)
+            if entry and entry["sha256"] == digest:
+                # Touched but not edited: remember the new time only.
+                entry["size"], entry["mtime"] = status.st_size, status.st_mtime
+                continue
+            changed[filename] = (path, digest)
+        removed = [filename for filename in self.files if filename not in files]
+        return {"changed": changed, "removed": removed}
+
+
+def sync_collection(
+    collection,
+    embeddings,
+    directory: str,
+    kind: str,
+    manifest: CollectionManifest,
+    progress=None,
+) -> dict:
+    """Bring a collection up to date with the files of one kind in a directory.
+
+    The manifest is first reconciled with the collection (see
+    CollectionManifest.reconcile). New and changed files are embedded and
+    upserted, then the chunks they had before are deleted and their hash is
+    recorded; the chunks of removed files are deleted. The manifest is saved
+    after every file, so an interrupted sync resumes with the files it did
+    not finish. Chunks that no file claims (from a collection built before
+    there were manifests, or an interrupted sync) are deleted at the end;
+    the collection is never cleared first, so it can be queried throughout.
+
+    Args:
+        collection: The chromadb collection.
+        embeddings (Embeddings): Embeds the documents' text.
+        directory (str): The source files' directory.
+        kind (str): "csv" or "pdf", see SOURCES.
+        manifest (CollectionManifest): The collection's manifest.
+        progress (callable): Called with the stats, plus the "source" file
+            name, after every batch.
+
+    Returns:
+        dict: File name -> "ingested", "removed" or "failed".
+    """
+    manifest.reconcile(collection)
+    changes = manifest.changes(source_files(directory, kind))
+    results = {}
+    for filename in changes["removed"]:
+        delete_ids(collection, manifest.files.pop(filename)["ids"])
+        record_hash(collection, filename, None)
+        manifest.save()
+        results[filename] = "removed"
+
+    for filename, (path, digest) in changes["changed"].items():
+        written_ids = []
+        file_progress = None
+        if progress is not None:
+            file_progress = lambda stats: progress({**stats, "source": filename})
+        try:
+            stats = ingest_documents(
+                collection,
+                embeddings,
+                _from_file(SOURCES[kind][1](path), filename),
+                progress=file_progress,
+                written_ids=written_ids,
+            )
+        except Exception as e:
+            print(f"Error reading {kind.upper()} file '{filename}': {e}")
+            # Chunks that did not change still belong to the old version.
+            old_ids = set(manifest.files.get(filename, {}).get("ids", []))
+            delete_ids(collection, [i for i in written_ids if i not in old_ids])
+            results[filename] = "failed"
+            continue
+        old_ids = manifest.files.get(filename, {}).get("ids", [])
+        new_ids = set(stats["ids"])
+        delete_ids(collection, [i for i in old_ids if i not in new_ids])
+        record_hash(collection, filename, digest)
+        status = os.stat(path)
+        manifest.files[filename] = {
+            "sha256": digest,
+            "size": status.st_size,
+            "mtime": status.st_mtime,
+            "ids": stats["ids"],
+            "ingested_at": time.time(),
+        }
+        manifest.save()
+        results[filename] = "ingested"
+    # Also keeps the times of files that were touched but not edited.
+    manifest.save()
+
+    claimed = {i for entry in manifest.files.values() for i in entry["ids"]}
+    if collection.count() != len(claimed):
+        orphans = [i for i in collection.get(include=[])["ids"] if i not in claimed]
+        print(f"Deleting {len(orphans)} chunks of {collection.name} no file claims")
+        delete_ids(collection, orphans)
+    return results
+
+
+def clear_collection(collection, manifest: CollectionManifest) -> None:
+    """Delete every chunk and recorded hash, so the next sync embeds every file."""
+    delete_ids(collection, collection.get(include=[])["ids"])
+    for filename in recorded_hashes(collection):
+        record_hash(collection, filename, None)
+    manifest.files = {}
+    manifest.save()
+
+
+def describe_progress(stats: dict) -> str:
+    """One line about an ingestion, ours or (``"waiting"``) another builder's."""
+    prefix = "Another session is loading the files: " if stats.get("waiting") else ""
+    if "rows" not in stats:
+        return f"{prefix}getting ready..."
+    return (
+        f"{prefix}{stats.get('source', '')} {stats['rows']} rows loaded "
+        f"({stats['rows_per_second']:.0f} rows/s, "
+        f"peak memory {stats['peak_memory_mib']:.0f} MiB)"
+    )
+
+
+def main():
+    from ingest_coordinator import IngestCoordinator, coordinated_sync
+    from rag_runtime import get_chroma_client, get_ingest_embeddings
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("kind", choices=sorted(SOURCES), help="the files to read")
+    parser.add_argument("directory", help="the directory with the files")
+    parser.add_argument("collection", help="the Chroma collection to fill")
+    parser.add_argument("--rebuild", action="store_true", help="embed every file again")
+    args = parser.parse_args()
+
+    client = get_chroma_client()
+    results, _ = coordinated_sync(
+        IngestCoordinator(client, args.collection),
+        get_ingest_embeddings(),
+        args.directory,
+        args.kind,
+        progress=lambda stats: print(describe_progress(stats), end="\r", flush=True),
+        rebuild=args.rebuild,
+    )
+    for filename, result in results.items():
+        print(f"{filename}: {result}")
+    if not results:
+        print(f"{args.collection} is up to date")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""Heavy dependencies imported on first use instead of at module import.
+
+Streamlit runs a page's imports on the first visit and again after every
+hot reload, so a page pays for Langflow, LangChain or Chroma even when the
+user never reaches the code that needs them. A module declared with
+lazy_import is only imported the first time one of its attributes is read:
+
+    langflow_load = lazy_import("langflow.load")
+    ...
+    graph = langflow_load.load_flow_from_json(flow)
+
+A missing package raises its ImportError at that first use, not on import.
+See import_profile.py for what each page's imports cost.
+"""
+
+import importlib
+import threading
+import time
+
+_LAZY_MODULES = {}
+_LAZY_MODULES_LOCK = threading.Lock()
+
+
+class LazyModule:
+    """Stands in for a module until one of its attributes is needed.
+
+    Args:
+        name (str): The module's dotted name, e.g. "langflow.load".
+    """
+
+    def __init__(self, name: str):
+        self.__dict__["_name"] = name
+        self.__dict__["_module"] = None
+        self.__dict__["_seconds"] = None
+        self.__dict__["_lock"] = threading.Lock()
+
+    def _load(self):
+        module = self.__dict__["_module"]
+        if module is not None:
+            return module
+        with self.__dict__["_lock"]:
+            if self.__dict__["_module"] is None:
+                started = time.perf_counter()
+                module = importlib.import_module(self._name)
+                self.__dict__["_seconds"] = time.perf_counter() - started
+                self.__dict__["_module"] = module
+                print(f"Imported {self._name} in {self._seconds:.2f}s on first use")
+        return self.__dict__["_module"]
+
+    def __getattr__(self, attribute: str):
+        return getattr(self._load(), attribute)
+
+    def __setattr__(self, attribute: str, value):
+        setattr(self._load(), attribute, value)
+
+    def __dir__(self):
+        return dir(self._load())
+
+    def __repr__(self) -> str:
+        state = "loaded" if self.__dict__["_module"] is not None else "not loaded"
+        return f"<lazy module {self._name!r} ({state})>"
+
+
+def lazy_import(name: str) -> LazyModule:
+    """Returns the process-wide lazy stand-in for a module."""
+    with _LAZY_MODULES_LOCK:
+        if name not in _LAZY_MODULES:
+            _LAZY_MODULES[name] = LazyModule(name)
+        return _LAZY_MODULES[name]
+
+
+def lazy_import_times() -> dict:
+    """Seconds each lazily imported module took, for the ones used so far."""
+    with _LAZY_MODULES_LOCK:
+        modules = list(_LAZY_MODULES.values())
+    return {
+        module._name: module._seconds
+        for module in modules
+        if module._seconds is not None
+    }
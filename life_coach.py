@@ -0,0 +1,303 @@
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import streamlit as st
+
+from advice_cache import profile_hash
+
+# The Life Coach tabs and their canned questions, as
+# {tab label: {button key: question}}.
+LIFE_COACH_QUESTIONS = {
+    "🩸 Blood Sugars": {
+        "bloodsugar_A1c": "What is a good estimate of my Hemoglobin A1c?",
+        "bloodsugar_lower": "What can I do to lower my blood sugars?",
+        "bloodsugar_complications": "What are some of the complications that I might develop if I continue with my current diabetes care?",
+    },
+    "🥑 Food": {
+        "food_carbohydrates": "Should I eat more protein or carbohydrates?",
+        "food_fiber": "Is a diet high in fiber good for diabetes?",
+        "food_alcohol": "Should I avoid alcohol with my diabetes?",
+    },
+    "⚖️ Weight": {
+        "weight_calories": "How does my weight affect my diabetes?",
+        "weight_exercise": "What are your recommendations on exercise to accomplish my goals?",
+    },
+    "🏋️‍♀️ Exercise": {
+        "exercise_protein_eat": "How many days a week should I exercise to gain more muscle?",
+        "exercise_weight_lifting": "Should I lift weights or start running?",
+    },
+}
+
+LIFE_COACH_PROMPT = """
+{question}
+This is my current profile and goals: {profile}
+"""
+
+# The Life Coach only answers when a flow is configured.
+FLOW_ID = os.environ.get("FLOW_ID")
+
+# How many canned answers are computed at the same time, over all sessions.
+LIFE_COACH_PREFETCH_WORKERS = int(os.environ.get("LIFE_COACH_PREFETCH_WORKERS", "2"))
+
+# The most canned answers waiting for a worker, over all sessions. A login
+# that finds the queue full is not prefetched; its questions are asked when
+# they are opened.
+LIFE_COACH_PREFETCH_QUEUE = int(os.environ.get("LIFE_COACH_PREFETCH_QUEUE", "50"))
+
+
+def life_coach_prompt(question: str, profile: str) -> str:
+    return LIFE_COACH_PROMPT.format(question=question, profile=profile)
+
+
+def all_questions() -> dict:
+    """Every canned question, as {button key: question}."""
+    return {
+        key: question
+        for questions in LIFE_COACH_QUESTIONS.values()
+        for key, question in questions.items()
+    }
+
+
+class AnswerPrefetcher:
+    """The workers that compute canned answers in the background.
+
+    A user's answers are computed once however many sessions they have
+    open: asking for an answer that is already queued or running gets the
+    same future. When a user's profile changes, their queued answers for
+    the old one are cancelled.
+
+    Args:
+        workers (int): How many answers are computed at the same time.
+        max_queued (int): The most answers waiting for a worker.
+    """
+
+    def __init__(
+        self,
+        workers: int = LIFE_COACH_PREFETCH_WORKERS,
+        max_queued: int = LIFE_COACH_PREFETCH_QUEUE,
+    ):
+        self.executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="life-coach"
+        )
+        self.max_queued = max_queued
+        self._futures = {}
+        self._lock = threading.Lock()
+
+    def submit(self, userid: str, fingerprint: str, questions: dict, *args) -> dict:
+        """Queue ``_answer(question, *args)`` for each of a user's questions.
+
+        Args:
+            userid (str): The user the answers are for.
+            fingerprint (str): The hash of the profile they are for.
+            questions (dict): Button key -> question.
+            *args: The rest of _answer's arguments.
+
+        Returns:
+            dict: Button key -> Future, for the questions that fit in the
+            queue or were already in it.
+        """
+        futures = {}
+        with self._lock:
+            for key, future in list(self._futures.items()):
+                stale = key[0] == userid and key[1] != fingerprint
+                if stale:
+                    future.cancel()
+                if stale or future.done():
+                    del self._futures[key]
+            queued = len(self._futures)
+            for key, question in questions.items():
+                future = self._futures.get((userid, fingerprint, key))
+                if future is None or future.cancelled():
+                    if queued >= self.max_queued:
+                        continue
+                    future = self.executor.submit(_answer, question, *args)
+                    self._futures[(userid, fingerprint, key)] = future
+                    queued += 1
+                futures[key] = future
+        if len(futures) < len(questions):
+            print(
+                f"The Life Coach prefetch queue is full, {userid} gets "
+                f"{len(futures)} of {len(questions)} answers ahead of time"
+            )
+        return futures
+
+
+@st.cache_resource
+def get_answer_prefetcher() -> AnswerPrefetcher:
+    """Returns the process-wide AnswerPrefetcher."""
+    return AnswerPrefetcher()
+
+
+def _answer(question: str, profile: str, userid: str, pool, cache) -> str:
+    # Imported here so a login does not wait for Langflow to import. The
+    # pool and cache come from the script thread: workers have no Streamlit
+    # context to look up cached resources with.
+    from advice_flow import ask_life_coach
+
+    return ask_life_coach(
+        life_coach_prompt(question, profile), profile, userid, pool, cache
+    )
+
+
+def _flow_resources() -> tuple:
+    """The advice graph pool and answer cache, for _answer's arguments."""
+    from advice_flow import get_advice_graph_pool, get_answer_cache
+
+    return get_advice_graph_pool(), get_answer_cache()
+
+
+def start_prefetch(profile: str, userid: str) -> dict:
+    """Start computing every canned answer for the session's profile.
+
+    The answers land in the answer cache; the futures are kept in
+    ``st.session_state.life_coach_prefetch`` so the page can wait for an
+    answer that is still being computed. Calling this again with the same
+    profile does nothing, and a new profile starts over.
+
+    Returns:
+        dict: Button key -> Future of the answer text (empty without FLOW_ID).
+    """
+    if not FLOW_ID:
+        return {}
+    fingerprint = profile_hash(profile)
+    prefetch = st.session_state.get("life_coach_prefetch")
+    if prefetch and prefetch["profile_hash"] == fingerprint:
+        return prefetch["futures"]
+
+    futures = get_answer_prefetcher().submit(
+        userid, fingerprint, all_questions(), profile, userid, *_flow_resources()
+    )
+    st.session_state.life_coach_prefetch = {
+        "profile_hash": fingerprint,
+        "futures": futures,
+    }
+    return futures
+
+
+def prefetched_answer(key: str, profile: str):
+    """The prefetched answer to a canned question, if the prefetch got to it.
+
+    Waits for an answer that is being computed. Returns None when there is
+    no prefetch for this profile, it failed, or the question is still queued;
+    a queued question is taken out of the queue, so the caller can ask it
+    right away instead.
+    """
+    prefetch = st.session_state.get("life_coach_prefetch")
+    if not prefetch or prefetch["profile_hash"] != profile_hash(profile):
+        return None
+    future = prefetch["futures"].get(key)
+    if future is None or future.cancel():
+        return None
+    try:
+        return future.result()
+    except Exception as e:
+        print(f"Prefetching the answer to {key} failed: {e}")
+        return None
+
+
+def get_answer(key: str, profile: str, userid: str) -> str:
+    """The answer text for one canned question, prefetched or asked now."""
+    answer = prefetched_answer(key, profile)
+    if answer is None:
+        answer = _answer(all_questions()[key], profile, userid, *_flow_resources())
+    return answer
+
+
+def stream_answer(key: str, profile: str, userid: str):
+    """Yield the text to show for one canned question as the model writes it.
+
+    A prefetched or cached answer is yielded whole. Otherwise the answer is
+    streamed (see advice_stream.py): a string answer as it is decoded and
+    each recommendation as soon as it is complete. The finished answer is
+    put in the answer cache like a flow answer.
+    """
+    from advice_flow import get_answer_cache
+    from advice_stream import AdviceStreamParser, answer_pieces, get_advice_streamer
+
+    prompt = life_coach_prompt(all_questions()[key], profile)
+    answer = prefetched_answer(key, profile)
+    if answer is None:
+        answer = get_answer_cache().get(prompt, profile)
+    if answer is not None:
+        yield from answer_pieces(answer)
+        return
+
+    parser = AdviceStreamParser()
+    for chunk in get_advice_streamer().stream(prompt, profile):
+        yield from parser.feed(chunk)
+    yield from parser.close()
+    try:
+        json.loads(parser.text)
+    except ValueError:
+        return
+    get_answer_cache().put(prompt, profile, parser.text, userid)
+
+
+def answer_tab(tab: str, profile: str, userid: str) -> dict:
+    """Answer every canned question of a Life Coach tab at once.
+
+    Questions the prefetch or the answer cache already answered are taken
+    as they are. The rest are asked in one batched prompt that sends the
+    profile once (see AdviceStreamer.answer_all); any question the batch
+    did not answer is asked on its own, all of them at the same time. Every
+    new answer is put in the answer cache.
+
+    Args:
+        tab (str): The tab label, a key of LIFE_COACH_QUESTIONS.
+        profile (str): The user's profile.
+        userid (str): The user the answers are cached for.
+
+    Returns:
+        dict: Button key -> answer text, for the questions that got one.
+    """
+    from advice_flow import get_answer_cache
+    from advice_stream import get_advice_streamer
+
+    questions = LIFE_COACH_QUESTIONS[tab]
+    prefetch = st.session_state.get("life_coach_prefetch")
+    if prefetch and prefetch["profile_hash"] == profile_hash(profile):
+        # Take the queued questions out first so they go into the batch.
+        for key in questions:
+            future = prefetch["futures"].get(key)
+            if future is not None:
+                future.cancel()
+
+    answers = {}
+    for key, question in questions.items():
+        answer = prefetched_answer(key, profile)
+        if answer is None:
+            answer = get_answer_cache().get(
+                life_coach_prompt(question, profile), profile
+            )
+        if answer is not None:
+            answers[key] = answer
+    missing = {key: q for key, q in questions.items() if key not in answers}
+    if not missing:
+        return answers
+
+    try:
+        batched = get_advice_streamer().answer_all(missing, profile)
+    except Exception as e:
+        print(f"Asking the {tab} questions in one prompt failed: {e}")
+        batched = {}
+    for key, answer in batched.items():
+        get_answer_cache().put(
+            life_coach_prompt(missing[key], profile), profile, answer, userid
+        )
+    answers.update(batched)
+
+    executor = get_answer_prefetcher().executor
+    resources = _flow_resources()
+    futures = {
+        key: executor.submit(_answer, question, profile, userid, *resources)
+        for key, question in missing.items()
+        if key not in batched
+    }
+    for key, future in futures.items():
+        try:
+            answers[key] = future.result()
+        except Exception as e:
+            print(f"Asking {key} failed: {e}")
+    return answers
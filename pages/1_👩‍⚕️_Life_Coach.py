@@ -1,53 +1,25 @@
 import json
 import os
-from datetime import datetime, timezone
-from typing import Optional
 
-import bs4
-import chromadb
 import firebase_admin
-import pandas as pd
-import plotly.express as px
 import pytz
 import requests
 import streamlit as st
-from bs4 import BeautifulSoup
-from chromadb.config import DEFAULT_DATABASE, DEFAULT_TENANT, Settings
-from firebase_admin import credentials, firestore
-from langchain import hub
-from langchain.agents import (
-    AgentExecutor,
-    AgentType,
-    create_react_agent,
-    create_tool_calling_agent,
-    initialize_agent,
-)
-from langchain.tools import BaseTool, Tool
-from langchain.tools.retriever import create_retriever_tool
-from langchain_chroma import Chroma
-from langchain_community.document_loaders import WebBaseLoader
-from langchain_community.embeddings import fastembed
-from langchain_community.tools.tavily_search import TavilySearchResults
-from langchain_core.documents import Document
-from langchain_core.prompts import ChatPromptTemplate, PromptTemplate
-from langchain_core.tools import tool
-from langchain_core.vectorstores import InMemoryVectorStore
-from langchain_ollama import ChatOllama
-from langchain_openai import ChatOpenAI
-from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langflow.load import run_flow_from_json
+from firebase_admin import credentials
+
+from advice_cache import profile_hash
+from advice_flow import get_answer_cache
+from cgm_analytics import agp_percentiles, daily_summary, glucose_metrics
+from data_backend import get_db
+from life_coach import LIFE_COACH_QUESTIONS, answer_tab, get_answer, stream_answer
+from profile_datasets import ensure_profile
+from users_directory import get_users_directory
 
 st.set_page_config(
     "Life Coach", page_icon=":material/self_improvement:", layout="centered"
 )
 
 
-FILE_PATH_DIABETIC_ADVICE = os.path.join(
-    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
-    "langflow/diabetic-advice.json",
-)
-
-
 FILE_PATH_NUTRITION = os.path.join(
     os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
     "documents/nutrition",
@@ -83,21 +55,7 @@ if "selected_food" not in st.session_state:
     st.session_state.selected_food = None
 
 
-db = firestore.client()  # Example for Firesto
-
-
-def get_diabetic_advice(question, profile):
-    TWEAKS = {
-        "TextInput-KpJPD": {"input_value": question},
-        "TextInput-t9gYO": {"input_value": profile},
-    }
-    return run_flow_from_json(
-        flow=FILE_PATH_DIABETIC_ADVICE,
-        input_type="text",
-        input_value=question,
-        fallback_to_env_vars=True,
-        tweaks=TWEAKS,
-    )
+db = get_db()  # Example for Firesto
 
 
 def adjust_datetime_for_phoenix(dt, from_timezone="UTC"):
@@ -133,380 +91,105 @@ def adjust_datetime_for_phoenix(dt, from_timezone="UTC"):
         return None
 
 
-if st.session_state.get("user"):
-    st.title("Hi, I am your Life Coach! 👩‍⚕️")
-    st.session_state.current_user = [
-        usr
-        for usr in st.session_state.users
-        if usr.get("email") == st.session_state["user"].email
-    ]
-    # st.write(st.session_state.current_user)
-    tab1, tab2, tab3, tab4 = st.tabs(
-        ["🩸 Blood Sugars", "🥑 Food", "⚖️ Weight", "🏋️‍♀️ Exercise"]
-    )
-    with tab1:
-
-        with st.expander("What is a good estimate of my Hemoglobin A1c?"):
-            flow_id = FLOW_ID
-            question = "What is a good estimate of my Hemoglobin A1c?"
-            profile = st.session_state.profile
-            prompt = f"""
-                     {question}
-                     This is my current profile and goals: {profile}
-                    """
-
-            if st.button(
-                "Please give me an recommendation...",
-                icon=":material/psychology:",
-                type="primary",
-                use_container_width=True,
-                key="bloodsugar_A1c",
-            ):
-                if flow_id and question and profile:
-                    with st.spinner("Thinking..."):
-                        try:
-                            result = get_diabetic_advice(prompt, profile)
-                            question_answer = json.loads(
-                                result[0].outputs[0].results["text"].data["text"]
-                            )
-                            if len(question_answer["answer"]) < 2:
-                                for recommendation in question_answer["answer"][
-                                    "recommendations"
-                                ]:
-                                    st.write(recommendation["advice"])
-                            else:
-                                st.write(question_answer["answer"])
-
-                        except requests.exceptions.RequestException as e:
-                            st.warning(f"Error: {e}")
-                        except json.JSONDecodeError as ex:
-                            st.warning(f"Error decoding JSON: {ex}")
-
-        with st.expander("What can I do to lower my blood sugars?"):
-            flow_id = FLOW_ID
-            question = "What can I do to lower my blood sugars?"
-            profile = st.session_state.profile
-            prompt = f"""
-                     {question}
-                     This is my current profile and goals: {profile}
-                    """
-
-            if st.button(
-                "Please give me an recommendation...",
-                icon=":material/psychology:",
-                type="primary",
-                use_container_width=True,
-                key="bloodsugar_lower",
-            ):
-                if flow_id and question and profile:
-                    with st.spinner("Thinking..."):
-                        try:
-                            result = get_diabetic_advice(prompt, profile)
-                            question_answer = json.loads(
-                                result[0].outputs[0].results["text"].data["text"]
-                            )
-
-                            st.write(question_answer["answer"])
-
-                        except requests.exceptions.RequestException as e:
-                            st.warning(f"Error: {e}")
-                        except json.JSONDecodeError as ex:
-                            st.warning(f"Error decoding JSON: {ex}")
-
-        with st.expander(
-            "What are some of the complications that I might develop if I continue with my current diabetes care?"
-        ):
-            flow_id = FLOW_ID
-            question = "What are some of the complications that I might develop if I continue with my current diabetes care?"
-            profile = st.session_state.profile
-            prompt = f"""
-                        {question}
-                        This is my current profile and goals: {profile}
-                        """
-
-            if st.button(
-                "Please give me an recommendation...",
-                icon=":material/psychology:",
-                type="primary",
-                use_container_width=True,
-                key="bloodsugar_complications",
-            ):
-                if flow_id and question and profile:
-                    with st.spinner("Thinking..."):
-                        try:
-                            result = get_diabetic_advice(prompt, profile)
-                            question_answer = json.loads(
-                                result[0].outputs[0].results["text"].data["text"]
-                            )
-                            if len(question_answer["answer"]) < 2:
-                                for recommendation in question_answer["answer"][
-                                    "recommendations"
-                                ]:
-                                    st.write(recommendation["advice"])
-                            else:
-                                st.write(question_answer["answer"])
-
-                        except requests.exceptions.RequestException as e:
-                            st.warning(f"Error: {e}")
-                        except json.JSONDecodeError as ex:
-                            st.warning(f"Error decoding JSON: {ex}")
-
-    with tab2:
-
-        with st.expander("Should I eat more protein or carbohydrates?"):
-            flow_id = FLOW_ID
-            question = "Should I eat more protein or carbohydrates?"
-            profile = st.session_state.profile
-            prompt = f"""
-                     {question}
-                     This is my current profile and goals: {profile}
-                    """
-
-            if st.button(
-                "Please give me an recommendation...",
-                icon=":material/psychology:",
-                type="primary",
-                use_container_width=True,
-                key="food_carbohydrates",
-            ):
-                if flow_id and question and profile:
-                    with st.spinner("Thinking..."):
-                        try:
-                            result = get_diabetic_advice(prompt, profile)
-                            question_answer = json.loads(
-                                result[0].outputs[0].results["text"].data["text"]
-                            )
-                            if len(question_answer["answer"]) < 2:
-                                for recommendation in question_answer["answer"][
-                                    "recommendations"
-                                ]:
-                                    st.write(recommendation["advice"])
-                            else:
-                                st.write(question_answer["answer"])
-
-                        except requests.exceptions.RequestException as e:
-                            st.warning(f"Error: {e}")
-                        except json.JSONDecodeError as ex:
-                            st.warning(f"Error decoding JSON: {ex}")
-
-        with st.expander("Is a diet high in fiber good for diabetes?"):
-            flow_id = FLOW_ID
-            question = "Is a diet high in fiber good for diabetes?"
-            profile = st.session_state.profile
-            prompt = f"""
-                     {question}
-                     This is my current profile and goals: {profile}
-                    """
-
-            if st.button(
-                "Please give me an recommendation...",
-                icon=":material/psychology:",
-                type="primary",
-                use_container_width=True,
-                key="food_fiber",
-            ):
-                if flow_id and question and profile:
-                    with st.spinner("Thinking..."):
-                        try:
-                            result = get_diabetic_advice(prompt, profile)
-                            question_answer = json.loads(
-                                result[0].outputs[0].results["text"].data["text"]
-                            )
-                            if len(question_answer["answer"]) < 2:
-                                for recommendation in question_answer["answer"][
-                                    "recommendations"
-                                ]:
-                                    st.write(recommendation["advice"])
-                            else:
-                                st.write(question_answer["answer"])
-
-                        except requests.exceptions.RequestException as e:
-                            st.warning(f"Error: {e}")
-                        except json.JSONDecodeError as ex:
-                            st.warning(f"Error decoding JSON: {ex}")
-        with st.expander("Should I avoid alcohol with my diabetes?"):
-            flow_id = FLOW_ID
-            question = "Should I avoid alcohol with my diabetes?"
-            profile = st.session_state.profile
-            prompt = f"""
-                     {question}
-                     This is my current profile and goals: {profile}
-                    """
-
-            if st.button(
-                "Please give me an recommendation...",
-                icon=":material/psychology:",
-                type="primary",
-                use_container_width=True,
-                key="food_alcohol",
-            ):
-                if flow_id and question and profile:
-                    with st.spinner("Thinking..."):
-                        try:
-                            result = get_diabetic_advice(prompt, profile)
-                            question_answer = json.loads(
-                                result[0].outputs[0].results["text"].data["text"]
-                            )
-                            if len(question_answer["answer"]) < 2:
-                                for recommendation in question_answer["answer"][
-                                    "recommendations"
-                                ]:
-                                    st.write(recommendation["advice"])
-                            else:
-                                st.write(question_answer["answer"])
-
-                        except requests.exceptions.RequestException as e:
-                            st.warning(f"Error: {e}")
-                        except json.JSONDecodeError as ex:
-                            st.warning(f"Error decoding JSON: {ex}")
-    with tab3:
-
-        with st.expander("How does my weight affect my diabetes?"):
-            flow_id = FLOW_ID
-            question = "How does my weight affect my diabetes?"
-            profile = st.session_state.profile
-            prompt = f"""
-                     {question}
-                     This is my current profile and goals: {profile}
-                    """
-
-            if st.button(
-                "Please give me an recommendation...",
-                icon=":material/psychology:",
-                type="primary",
-                use_container_width=True,
-                key="weight_calories",
-            ):
-                if flow_id and question and profile:
-                    with st.spinner("Thinking..."):
-                        try:
-                            result = get_diabetic_advice(prompt, profile)
-                            question_answer = json.loads(
-                                result[0].outputs[0].results["text"].data["text"]
-                            )
-                            if len(question_answer["answer"]) < 2:
-                                for recommendation in question_answer["answer"][
-                                    "recommendations"
-                                ]:
-                                    st.write(recommendation["advice"])
-                            else:
-                                st.write(question_answer["answer"])
-
-                        except requests.exceptions.RequestException as e:
-                            st.warning(f"Error: {e}")
-                        except json.JSONDecodeError as ex:
-                            st.warning(f"Error decoding JSON: {ex}")
-
-        with st.expander(
-            "What are your recommendations on exercise to accomplish my goals?"
-        ):
-            flow_id = FLOW_ID
-            question = (
-                "What are your recommendations on exercise to accomplish my goals?"
-            )
-            profile = st.session_state.profile
-            prompt = f"""
-                     {question}
-                     This is my current profile and goals: {profile}
-                    """
-
-            if st.button(
-                "Please give me an recommendation...",
-                icon=":material/psychology:",
-                type="primary",
-                use_container_width=True,
-                key="weight_exercise",
-            ):
-                if flow_id and question and profile:
-                    with st.spinner("Thinking..."):
-                        try:
-                            result = get_diabetic_advice(prompt, profile)
-                            question_answer = json.loads(
-                                result[0].outputs[0].results["text"].data["text"]
-                            )
-                            if len(question_answer["answer"]) < 2:
-                                for recommendation in question_answer["answer"][
-                                    "recommendations"
-                                ]:
-                                    st.write(recommendation["advice"])
-                            else:
-                                st.write(question_answer["answer"])
-
-                        except requests.exceptions.RequestException as e:
-                            st.warning(f"Error: {e}")
-                        except json.JSONDecodeError as ex:
-                            st.warning(f"Error decoding JSON: {ex}")
-
-    with tab4:
+def write_answer(answer_text: str):
+    question_answer = json.loads(answer_text)
+    answer = question_answer["answer"]
+    if isinstance(answer, dict) and "recommendations" in answer:
+        for recommendation in answer["recommendations"]:
+            st.write(recommendation["advice"])
+    else:
+        st.write(answer)
 
-        with st.expander("How many days a week should I exercise to gain more muscle?"):
-            flow_id = FLOW_ID
-            question = "How many days a week should I exercise to gain more muscle?"
-            profile = st.session_state.profile
-            prompt = f"""
-                     {question}
-                     This is my current profile and goals: {profile}
-                    """
 
-            if st.button(
-                "Please give me an recommendation...",
-                icon=":material/psychology:",
-                type="primary",
-                use_container_width=True,
-                key="exercise_protein_eat",
-            ):
-                if flow_id and question and profile:
-                    with st.spinner("Thinking..."):
-                        try:
-                            result = get_diabetic_advice(prompt, profile)
-                            question_answer = json.loads(
-                                result[0].outputs[0].results["text"].data["text"]
-                            )
-                            if len(question_answer["answer"]) < 2:
-                                for recommendation in question_answer["answer"][
-                                    "recommendations"
-                                ]:
-                                    st.write(recommendation["advice"])
-                            else:
-                                st.write(question_answer["answer"])
+def show_answer(key: str, profile: str, stream: bool):
+    if stream:
+        try:
+            st.write_stream(stream_answer(key, profile, st.session_state.userid))
+        except Exception as e:
+            st.warning(f"Error: {e}")
+        return
 
-                        except requests.exceptions.RequestException as e:
-                            st.warning(f"Error: {e}")
-                        except json.JSONDecodeError as ex:
-                            st.warning(f"Error decoding JSON: {ex}")
+    with st.spinner("Thinking..."):
+        try:
+            write_answer(get_answer(key, profile, st.session_state.userid))
+        except requests.exceptions.RequestException as e:
+            st.warning(f"Error: {e}")
+        except json.JSONDecodeError as ex:
+            st.warning(f"Error decoding JSON: {ex}")
 
-        with st.expander("Should I lift weights or start running?"):
-            flow_id = FLOW_ID
-            question = "Should I lift weights or start running?"
-            profile = st.session_state.profile
-            prompt = f"""
-                     {question}
-                     This is my current profile and goals: {profile}
-                    """
 
+if st.session_state.get("user"):
+    st.title("Hi, I am your Life Coach! 👩‍⚕️")
+    current_user = get_users_directory().find_by_email(st.session_state["user"].email)
+    st.session_state.current_user = [current_user] if current_user else []
+    # The Life Coach is the only page that reads the profile datasets.
+    with st.spinner("Getting to know you...", show_time=True):
+        ensure_profile()
+    # st.write(st.session_state.current_user)
+    stream_answers = st.toggle("Show answers as they are written", value=True)
+    tabs = st.tabs(list(LIFE_COACH_QUESTIONS))
+    with tabs[0]:
+
+        with st.expander("My glucose dashboard", icon=":material/monitoring:"):
+            glucose = st.session_state.glucose_data
+            metrics = glucose_metrics(glucose)
+            if metrics["readings"]:
+                ranges = metrics["time_in_ranges"]
+                col1, col2, col3 = st.columns(3)
+                col1.metric("Time in range (70-180)", f"{ranges['in_range']:.0%}")
+                col2.metric("GMI", f"{metrics['gmi']:.1f}%")
+                col3.metric("Variability (CV)", f"{metrics['cv']:.1f}%")
+                st.caption(
+                    f"{metrics['readings']} readings over {metrics['days']} days, "
+                    f"below range {ranges['very_low'] + ranges['low']:.0%}, "
+                    f"above range {ranges['high'] + ranges['very_high']:.0%}"
+                )
+                st.subheader("Blood sugar by hour of the day")
+                st.line_chart(agp_percentiles(glucose), x_label="Hour", y_label="mg/dl")
+                st.subheader("Daily average")
+                st.line_chart(daily_summary(glucose)["mean"], y_label="mg/dl")
+            else:
+                st.write("There are no blood sugar readings yet.")
+
+    profile = st.session_state.profile
+    # Answers from "Answer everything in this tab", for this profile only.
+    if st.session_state.get("life_coach_answers_profile") != profile_hash(profile):
+        st.session_state.life_coach_answers_profile = profile_hash(profile)
+        st.session_state.life_coach_answers = {}
+    for tab, (label, questions) in zip(tabs, LIFE_COACH_QUESTIONS.items()):
+        with tab:
+            # One prompt for the whole tab sends the profile once.
             if st.button(
-                "Please give me an recommendation...",
-                icon=":material/psychology:",
-                type="primary",
-                use_container_width=True,
-                key="exercise_weight_lifting",
+                "Answer everything in this tab",
+                icon=":material/checklist:",
+                key=f"ask_all_{label}",
             ):
-                if flow_id and question and profile:
-                    with st.spinner("Thinking..."):
+                if FLOW_ID and profile:
+                    with st.spinner("Thinking...", show_time=True):
+                        st.session_state.life_coach_answers.update(
+                            answer_tab(label, profile, st.session_state.userid)
+                        )
+            for key, question in questions.items():
+                answered = st.session_state.life_coach_answers.get(key)
+                with st.expander(question, expanded=answered is not None):
+                    if answered is not None:
                         try:
-                            result = get_diabetic_advice(prompt, profile)
-                            question_answer = json.loads(
-                                result[0].outputs[0].results["text"].data["text"]
-                            )
-                            if len(question_answer["answer"]) < 2:
-                                for recommendation in question_answer["answer"][
-                                    "recommendations"
-                                ]:
-                                    st.write(recommendation["advice"])
-                            else:
-                                st.write(question_answer["answer"])
-
-                        except requests.exceptions.RequestException as e:
-                            st.warning(f"Error: {e}")
-                        except json.JSONDecodeError as ex:
+                            write_answer(answered)
+                        except (json.JSONDecodeError, KeyError, TypeError) as ex:
                             st.warning(f"Error decoding JSON: {ex}")
+                    elif st.button(
+                        "Please give me an recommendation...",
+                        icon=":material/psychology:",
+                        type="primary",
+                        use_container_width=True,
+                        key=key,
+                    ):
+                        if FLOW_ID and question and profile:
+                            show_answer(key, profile, stream_answers)
+
+    answer_cache = get_answer_cache().stats()
+    st.caption(
+        f"Answer cache: {answer_cache['hits']} hits, "
+        f"{answer_cache['misses']} misses, "
+        f"profile {st.session_state.profile_tokens} tokens"
+    )
@@ -2,9 +2,11 @@ import os
 from datetime import datetime
 
 import firebase_admin
-import pandas as pd
 import streamlit as st
-from firebase_admin import auth, credentials, firestore
+from firebase_admin import auth, credentials
+
+from data_backend import get_db
+from users_directory import get_users_directory
 
 st.set_page_config(
     "Settings", page_icon=":material/manage_accounts:", layout="centered"
@@ -45,15 +47,8 @@ def handle_user_table_selected():
     # st.write(st.session_state.selected_user.loc["Email"])
 
 
-db = firestore.client()  # Firestore
-
-if "users" not in st.session_state:
-    st.session_state.users = []
-    users_ref = db.collection("users")
-    for doc in users_ref.stream():
-        userid = {"userid": doc.id}
-        user = {**userid, **doc.to_dict()}
-        st.session_state.users.append(user)
+db = get_db()  # Firestore
+users_directory = get_users_directory()
 
 st.title("Here are few housekeeping items that we need to get done:")
 with st.expander("Users (Diabetics)", icon=":material/group:"):
@@ -72,31 +67,23 @@ with st.expander("Users (Diabetics)", icon=":material/group:"):
                     .get("rows")[0]
                 ]
                 # st.write(st.session_state.selected_user.loc["Email"])
-                for usr in st.session_state.users:
-                    if usr.get("email") == st.session_state.selected_user.loc["Email"]:
-                        db.collection("users").document(usr.get("userid")).delete()
+                usr = users_directory.find_by_userid(
+                    st.session_state.selected_user.loc["userid"]
+                )
+                if usr:
+                    db.collection("users").document(usr.get("userid")).delete()
+                users_directory.invalidate()
                 st.session_state.delete_button_status = True
                 st.rerun()
 
-    users_ref = db.collection("users")
-    st.session_state.users = []
-    st.session_state.users_df = pd.DataFrame()
-    for doc in users_ref.stream():
-        userid = {"userid": doc.id}
-        user = {**userid, **doc.to_dict()}
-        st.session_state.users.append(user)
-        new_user_df = pd.DataFrame(
-            {"Name": [user.get("displayName")], "Email": [user.get("email")]}
-        )
-        st.session_state.users_df = pd.concat(
-            [st.session_state.users_df, new_user_df], ignore_index=True
-        )
+    st.session_state.users_df = users_directory.table()
 
     st.dataframe(
         st.session_state.users_df,
         use_container_width=True,
         selection_mode="single-row",
         hide_index=True,
+        column_order=["Name", "Email"],
         on_select=handle_user_table_selected,
         key="user_dataframe",
     )
@@ -183,6 +170,7 @@ with st.expander("Users (Diabetics)", icon=":material/group:"):
         }
 
         db.collection("users").add(new_user)
+        users_directory.invalidate()
 
         st.session_state.user_firstname = ""
         st.session_state.user_lastname = ""
@@ -0,0 +1,75 @@
+import streamlit as st
+
+from data_backend import get_db
+from firestore_loader import SESSION_FRAMES, ReadCounter, load_user_frames
+from life_coach import start_prefetch
+from profile_stats import (
+    PROFILE_FRAMES,
+    build_profile,
+    compute_profile_stats,
+    count_tokens,
+)
+from snapshot_store import UserSnapshot
+
+# Datasets the Life Coach profile is built from.
+PROFILE_DATASETS = (*PROFILE_FRAMES, "post_data")
+
+
+def require_datasets(*names: str) -> dict:
+    """Make sure the logged-in user's datasets are in the session.
+
+    Pages call this with the datasets they read. The ones that are not in
+    st.session_state yet are fetched together (see load_user_frames) and kept
+    for the rest of the session, so a dataset is read from Firestore the first
+    time any page needs it and never on the pages that don't.
+
+    Args:
+        *names (str): Session state keys from SESSION_FRAMES, e.g. "glucose_data".
+
+    Returns:
+        dict: Session state key -> DataFrame for every requested dataset.
+    """
+    if "read_counter" not in st.session_state:
+        st.session_state.read_counter = ReadCounter()
+    if "load_timings" not in st.session_state:
+        st.session_state.load_timings = {}
+
+    missing = {
+        name: SESSION_FRAMES[name] for name in names if name not in st.session_state
+    }
+    if missing:
+        for key, frame, seconds in load_user_frames(
+            get_db(),
+            st.session_state.userid,
+            missing,
+            read_counter=st.session_state.read_counter,
+            snapshot=UserSnapshot(st.session_state.userid),
+        ):
+            st.session_state[key] = frame
+            st.session_state.load_timings[key] = round(seconds, 3)
+
+    return {name: st.session_state[name] for name in names}
+
+
+def ensure_profile() -> str:
+    """Returns the Life Coach profile, loading its datasets on first use.
+
+    The number of tokens in it is kept in ``st.session_state.profile_tokens``.
+    Building the profile also starts prefetching the canned Life Coach
+    answers for it in the background (see life_coach.start_prefetch).
+    """
+    if "profile" not in st.session_state:
+        frames = require_datasets(*PROFILE_DATASETS)
+        st.session_state.profile_stats = compute_profile_stats(
+            {key: frames[key] for key in PROFILE_FRAMES}
+        )
+        st.session_state.profile = build_profile(
+            st.session_state.current_user[0],
+            st.session_state.profile_stats,
+            frames["post_data"],
+        )
+        st.session_state.profile_tokens = count_tokens(st.session_state.profile)
+        print(f"Life Coach profile: {st.session_state.profile_tokens} tokens")
+        # The canned Life Coach answers are ready by the time they are asked.
+        start_prefetch(st.session_state.profile, st.session_state.userid)
+    return st.session_state.profile
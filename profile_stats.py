@@ -0,0 +1,260 @@
+import hashlib
+import os
+import re
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+from cgm_analytics import glucose_metrics
+from timeseries import TimeSeries
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+# The stats of the last few distinct sets of frames, keyed on their content hash.
+_STATS_CACHE = OrderedDict()
+_STATS_CACHE_SIZE = 64
+_STATS_CACHE_LOCK = threading.Lock()
+
+# Tokens the whole profile may take; the posts get what the facts leave.
+PROFILE_TOKEN_BUDGET = int(os.environ.get("PROFILE_TOKEN_BUDGET", "1500"))
+
+# The tokenizer of the Life Coach model (gpt-4o-mini).
+PROFILE_ENCODING = "o200k_base"
+
+# Posts that mention these are the ones worth telling the Life Coach about.
+RELEVANT_POST_TERMS = re.compile(
+    r"\b(diabet|sugar|glucose|a1c|insulin|metformin|carb|diet|food|eat|meal|"
+    r"weigh|pound|exercis|walk|run|gym|workout|sleep|water|stress|tired|"
+    r"feel|goal|doctor)",
+    re.IGNORECASE,
+)
+
+# The session DataFrames that compute_profile_stats reads.
+PROFILE_FRAMES = (
+    "glucose_data",
+    "weight_data",
+    "exercise_data",
+    "food_data",
+    "sleep_data",
+    "water_data",
+    "foodunderstanding_data",
+)
+
+PROFILE_TEMPLATE = """ MY PROFILE IS THE FOLLOWING:
+Facts about me:
+I am a  {age}-year-old {gender} who was diagnosed with Type 2 diabetes.
+I take metformin daily for my diabetes. I would describe my activity level as {activity}. My height is {height}.
+I used to weight {original_weight} pounds, but after trying to eat better and exercise my new weight is {current_weight} pounds. In fact, my most favorite exercise is {most_frequent_exercise},
+and my most favorite food is {most_frequent_food}. I count my macronutrients. Most of my calories have on average {average_carbohydrates:.2f}
+of carbohydrates per meal, {average_protein:.2f} of protein per meal, and {average_fats:.2f} of fats per meal.
+My average blood glucose level in mg/dl is {average_glucose:.2f},which give me an estimated hemoglobin A1c of {estimated_a1c:.2f}.
+My blood sugar is in the 70-180 mg/dl range {time_in_range:.0f}% of the time, below it {time_below_range:.0f}% and above it {time_above_range:.0f}% of the time. My glucose management indicator is {gmi:.2f}% and my glucose variability (coefficient of variation) is {glucose_cv:.1f}%.
+I often sleep on average of {average_sleep:.2f} hours a day. I drink on average {average_water:.2f} ounces of water a day.
+I would say that I have {carbohydrate_understanding} understanding of picking foods with the right amount carbohydrates.
+When I share my feeling with others about my diabetes I have the following comments:
+{post_comments}
+GOALS:
+I guess my goals can be summed up in the following sentences: {notes}
+"""
+
+
+def frames_fingerprint(frames: dict) -> str:
+    """A content hash of a dict of DataFrames and TimeSeries.
+
+    Hashes the column names and every value, so two frames with the same data
+    get the same fingerprint no matter which session loaded them.
+    """
+    digest = hashlib.sha1()
+    for name in sorted(frames):
+        frame = frames[name]
+        digest.update(name.encode())
+        if isinstance(frame, TimeSeries):
+            digest.update(frame.fingerprint())
+            continue
+        digest.update("\x1f".join(map(str, frame.columns)).encode())
+        digest.update(pd.util.hash_pandas_object(frame, index=False).values.tobytes())
+    return digest.hexdigest()
+
+
+def _mode(series: pd.Series):
+    counts = series.value_counts()
+    return counts.idxmax() if len(counts) else None
+
+
+def _compute_profile_stats(frames: dict) -> dict:
+    weight = frames["weight_data"]
+    food = frames["food_data"]
+    carbohydrate_errors = frames["foodunderstanding_data"]["CarbohydrateError"]
+
+    # The series are sorted by time: the oldest and newest weigh-in are the ends.
+    original_weight = weight.first_value()
+    current_weight = weight.last_value()
+
+    average_glucose = frames["glucose_data"].mean()
+    glucose = glucose_metrics(frames["glucose_data"])
+    ranges = glucose["time_in_ranges"]
+    macros = food[["carbohydrates", "protein", "fats"]].mean()
+
+    carbohydrate_understanding = 0
+    if len(carbohydrate_errors):
+        carbohydrate_understanding = (
+            "fair" if carbohydrate_errors.mean() < 100 else "poor"
+        )
+
+    return {
+        "original_weight": original_weight,
+        "current_weight": current_weight,
+        "weight_change": (
+            current_weight - original_weight if original_weight is not None else None
+        ),
+        "average_glucose": average_glucose,
+        "estimated_a1c": (average_glucose + 46.7) / 28.7,
+        "time_in_range": 100 * ranges["in_range"],
+        "time_below_range": 100 * (ranges["very_low"] + ranges["low"]),
+        "time_above_range": 100 * (ranges["high"] + ranges["very_high"]),
+        "gmi": glucose["gmi"] or 0.0,
+        "glucose_cv": glucose["cv"] or 0.0,
+        "most_frequent_exercise": _mode(frames["exercise_data"]["Exercise"]),
+        "most_frequent_food": _mode(food["name"]),
+        "average_carbohydrates": float(np.nan_to_num(macros["carbohydrates"])),
+        "average_protein": float(np.nan_to_num(macros["protein"])),
+        "average_fats": float(np.nan_to_num(macros["fats"])),
+        "average_sleep": frames["sleep_data"].mean(),
+        "average_water": frames["water_data"].mean(),
+        "carbohydrate_understanding": carbohydrate_understanding,
+    }
+
+
+def compute_profile_stats(frames: dict) -> dict:
+    """Compute the statistics that go into the Life Coach profile.
+
+    Args:
+        frames (dict): The session datasets named in PROFILE_FRAMES, keyed
+            like st.session_state: TimeSeries for glucose, weight, sleep and
+            water, DataFrames for the rest. They are not modified.
+
+    Returns:
+        dict: Weight change, mean glucose, estimated A1c, time in range, GMI,
+        glucose variability, favourite exercise and food, macro averages,
+        sleep, water and carbohydrate understanding.
+        The result is memoized on the content hash of the frames, so reruns,
+        page switches and other sessions with the same data reuse it.
+    """
+    key = frames_fingerprint(frames)
+    with _STATS_CACHE_LOCK:
+        if key in _STATS_CACHE:
+            _STATS_CACHE.move_to_end(key)
+            return _STATS_CACHE[key]
+
+    stats = _compute_profile_stats(frames)
+
+    with _STATS_CACHE_LOCK:
+        _STATS_CACHE[key] = stats
+        while len(_STATS_CACHE) > _STATS_CACHE_SIZE:
+            _STATS_CACHE.popitem(last=False)
+    return stats
+
+
+@lru_cache(maxsize=1)
+def _encoding():
+    if tiktoken is None:
+        return None
+    try:
+        return tiktoken.get_encoding(PROFILE_ENCODING)
+    except Exception as e:
+        # tiktoken downloads the encoding on first use, which can fail.
+        print(f"Estimating profile tokens, {PROFILE_ENCODING} did not load: {e}")
+        return None
+
+
+def count_tokens(text: str) -> int:
+    """The number of tokens the Life Coach model reads for a text.
+
+    Without tiktoken, or when its encoding can not be loaded, estimated as
+    one token per four characters.
+    """
+    encoding = _encoding()
+    if encoding is None:
+        return (len(text) + 3) // 4
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def select_posts(messages: list, budget: int) -> list:
+    """Pick the posts to quote in the profile within a token budget.
+
+    Posts that mention more diabetes, food, exercise or wellbeing terms come
+    first, and among equally relevant posts the newest comes first. Posts are
+    taken in that order while they fit; repeated posts are quoted once.
+
+    Args:
+        messages (list): The user's post messages, oldest first.
+        budget (int): Tokens the quoted posts may take.
+
+    Returns:
+        list: The chosen messages, most relevant first.
+    """
+    newest_first = dict.fromkeys(m.strip() for m in reversed(messages) if m.strip())
+    # sorted is stable, so equally relevant posts stay newest first.
+    ranked = sorted(
+        newest_first,
+        key=lambda message: len(set(RELEVANT_POST_TERMS.findall(message.lower()))),
+        reverse=True,
+    )
+    chosen = []
+    # ", " between posts is about one token.
+    for message in ranked:
+        if budget < 2:
+            break
+        tokens = count_tokens(message) + 1
+        if tokens <= budget:
+            chosen.append(message)
+            budget -= tokens
+    return chosen
+
+
+def build_profile(
+    user: dict,
+    stats: dict,
+    post_data: pd.DataFrame,
+    token_budget: int = PROFILE_TOKEN_BUDGET,
+) -> str:
+    """Render the profile text that is sent to the Life Coach flow.
+
+    The profile goes into every Life Coach prompt, so its size is bounded:
+    the facts and goals are always included and the user's posts, ordered by
+    their create time, fill the rest of ``token_budget`` (see select_posts).
+
+    Args:
+        user (dict): The logged-in user's document from the users collection.
+        stats (dict): The result of compute_profile_stats.
+        post_data (pd.DataFrame): The user's SugarGram posts.
+        token_budget (int): Tokens the whole profile may take.
+
+    Returns:
+        str: The profile prompt.
+    """
+    fields = dict(
+        age=user.get("age"),
+        gender=user.get("gender"),
+        activity=user.get("activity"),
+        height=user.get("height"),
+        notes=user.get("notes"),
+        **stats,
+    )
+    facts_tokens = count_tokens(PROFILE_TEMPLATE.format(post_comments="", **fields))
+    if "createTime" in post_data:
+        # Firestore returns posts in document id order, which is random.
+        post_data = post_data.sort_values(
+            "createTime", kind="stable", na_position="first"
+        )
+    posts = select_posts(
+        post_data["userMessage"].dropna().astype(str).tolist(),
+        token_budget - facts_tokens,
+    )
+    return PROFILE_TEMPLATE.format(post_comments=", ".join(posts), **fields)
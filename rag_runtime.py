@@ -0,0 +1,201 @@
+import os
+import threading
+
+import chromadb
+import streamlit as st
+from chromadb.config import DEFAULT_DATABASE, DEFAULT_TENANT, Settings
+from langchain.chains import RetrievalQA
+from langchain.prompts import PromptTemplate
+from langchain.schema.output_parser import StrOutputParser
+from langchain.schema.runnable import RunnablePassthrough
+from langchain_chroma import Chroma
+from langchain_community.embeddings import fastembed
+from langchain_ollama import ChatOllama
+
+from embedding_cache import CachedEmbeddings
+from ingest_coordinator import IngestCoordinator, coordinated_sync
+from ingestion import (
+    INGEST_BATCH_SIZE,
+    INGEST_EMBED_WORKERS,
+    CollectionManifest,
+    source_files,
+)
+
+HOST_NAME = os.environ.get("CHROMA_HOST_NAME", "chromadb")
+BASE_URL = os.environ.get("OLLAMA_URL", "http://ollama:11434")
+MODEL = "llama3.2:1b"
+
+
+def format_docs(docs):
+    return "\n\n".join(doc.page_content for doc in docs)
+
+
+def get_collection_size(
+    client_collection: chromadb.Client, collection_name: str
+) -> int:
+    """Check if a collection with the given name exist in ChromaDB
+
+    Args:
+        client_collection (chromadb.Client): The ChromaDB client instance.
+        collection_name (str): The name of the collection to check
+
+    Returns:
+        int: Size of the collection.  If the collection doesn't exist, then the size is zero.
+    """
+    try:
+        collection = client_collection.get_collection(name=collection_name)
+        return collection.count()
+    except ValueError:
+        return 0
+    except Exception:
+        return 0
+
+
+@st.cache_resource
+def get_chroma_client() -> chromadb.HttpClient:
+    """Returns the process-wide client of the Chroma server."""
+    return chromadb.HttpClient(
+        host=HOST_NAME,
+        port=8000,
+        ssl=False,
+        headers=None,
+        settings=Settings(),
+        tenant=DEFAULT_TENANT,
+        database=DEFAULT_DATABASE,
+    )
+
+
+@st.cache_resource
+def get_embeddings() -> CachedEmbeddings:
+    """Returns the process-wide FastEmbed model; loading its ONNX model is slow."""
+    return CachedEmbeddings(fastembed.FastEmbedEmbeddings())
+
+
+@st.cache_resource
+def get_ingest_embeddings() -> CachedEmbeddings:
+    """The same model as get_embeddings, embedding in parallel worker processes.
+
+    Kept apart because starting the workers would slow down every query.
+    Ingestion streams a whole file through one call (see
+    embedding_cache.embed_stream), so the workers start once per file. A
+    single worker is slower than embedding in this process, so one core
+    does not get a pool. Both share the embedding cache, so ingested chunks
+    are not embedded twice.
+    """
+    workers = INGEST_EMBED_WORKERS or os.cpu_count() or 1
+    return CachedEmbeddings(
+        fastembed.FastEmbedEmbeddings(
+            batch_size=INGEST_BATCH_SIZE, parallel=workers if workers > 1 else None
+        )
+    )
+
+
+@st.cache_resource
+def get_chat_model() -> ChatOllama:
+    return ChatOllama(base_url=BASE_URL, model=MODEL)
+
+
+class RagRuntime:
+    """Everything a persona page needs to answer from one Chroma collection.
+
+    The vector store, retriever and chains are built once and shared by
+    every session, so a chat message only costs retrieval and generation.
+    The collection is kept in step with the page's source files through its
+    ingestion manifest (see ingestion.sync_collection).
+
+    Args:
+        collection_name (str): The page's Chroma collection.
+        prompt_template (str): The page's prompt, with {question} and {context}.
+        source_directory (str): The files the collection is built from.
+        source_kind (str): "csv" or "pdf".
+    """
+
+    def __init__(
+        self,
+        collection_name: str,
+        prompt_template: str,
+        source_directory: str,
+        source_kind: str,
+    ):
+        self.collection_name = collection_name
+        self.source_directory = source_directory
+        self.source_kind = source_kind
+        self.manifest = CollectionManifest(collection_name)
+        self.client = get_chroma_client()
+        self.coordinator = IngestCoordinator(self.client, collection_name)
+        self.model = get_chat_model()
+        self.vector_store = Chroma(
+            collection_name=collection_name,
+            embedding_function=get_embeddings(),
+            client=self.client,
+        )
+        self.retriever = self.vector_store.as_retriever()
+        self.prompt = PromptTemplate.from_template(prompt_template)
+        self.rag_chain = (
+            {"context": self.retriever | format_docs, "question": RunnablePassthrough()}
+            | self.prompt
+            | self.model
+            | StrOutputParser()
+        )
+        self.qa = RetrievalQA.from_chain_type(
+            llm=self.model, chain_type="stuff", retriever=self.retriever
+        )  # "stuff" chain type is common
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def collection_size(self) -> int:
+        """The number of chunks in the collection.
+
+        Asks the Chroma server until the collection has been filled, then
+        remembers the answer instead of probing it on every rerun.
+        """
+        if not self._size:
+            size = get_collection_size(self.client, self.collection_name)
+            with self._lock:
+                self._size = max(self._size, size)
+        return self._size
+
+    def needs_sync(self) -> bool:
+        """Whether source files were added, edited or removed since the last sync.
+
+        Only the files' sizes and times are read unless one of them changed.
+        While another session of this process is building the collection,
+        the answer is yes, so the page waits for it (see sync).
+        """
+        # The Chroma server lost the collection, e.g. its volume was reset.
+        if self.manifest.files and not self.collection_size():
+            return True
+        with self.coordinator.in_process() as free:
+            if not free:
+                return True
+            changes = self.manifest.changes(
+                source_files(self.source_directory, self.source_kind)
+            )
+        return bool(changes["changed"] or changes["removed"])
+
+    def sync(self, progress=None) -> dict:
+        """Embed the new and changed source files and drop the removed ones.
+
+        Only one session or process builds a collection at a time; the others
+        wait for it, getting its progress, and then only do what is left.
+        """
+        results, self.manifest = coordinated_sync(
+            self.coordinator,
+            get_ingest_embeddings(),
+            self.source_directory,
+            self.source_kind,
+            progress=progress,
+        )
+        self._size = 0
+        return results
+
+
+@st.cache_resource
+def get_rag_runtime(
+    collection_name: str,
+    prompt_template: str,
+    source_directory: str,
+    source_kind: str,
+) -> RagRuntime:
+    """Returns the process-wide RagRuntime of a collection."""
+    return RagRuntime(collection_name, prompt_template, source_directory, source_kind)
@@ -0,0 +1,130 @@
+"""Seed the local Firestore stand-in with synthetic patients.
+
+Every patient is a copy of one of the three sample patients in
+documents/fakedate (blood sugar, weight, exercise and food), under a new
+userid and email. Example:
+
+    python seed_fake_db.py --users 1000 --reset
+    DATA_BACKEND=fake streamlit run Login.py
+"""
+
+import argparse
+import csv
+import os
+import time
+
+from bulk_import import parse_number
+from data_backend import FAKE_DB_PATH, MAX_BATCH_WRITES, get_fake_db
+
+FILE_PATH_FAKE_DATA = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)),
+    "documents/fakedate",
+)
+
+# The userids the shared exercise and food CSVs use for sample patients 1, 2 and 3.
+SAMPLE_USERIDS = ("11111", "22222", "33333")
+
+
+def read_csv(filename: str) -> list:
+    with open(os.path.join(FILE_PATH_FAKE_DATA, filename), encoding="utf-8") as f:
+        return [
+            {key: parse_number(value) for key, value in row.items()}
+            for row in csv.DictReader(f)
+        ]
+
+
+def load_sample_patients() -> list:
+    """Returns, per sample patient, {collection name: list of documents}."""
+    exercises = read_csv("diabetic_patient_exercise.csv")
+    foods = read_csv("diabetic_food.csv")
+    patients = []
+    for number, sample_userid in enumerate(SAMPLE_USERIDS, start=1):
+        patients.append(
+            {
+                "bloodsugars": read_csv(f"diabetic_patient{number}_bloodsugar.csv"),
+                "weights": read_csv(f"diabetic_patient{number}_weight.csv"),
+                "exercises": [
+                    row for row in exercises if str(row["userid"]) == sample_userid
+                ],
+                "foods": [row for row in foods if str(row["userid"]) == sample_userid],
+            }
+        )
+    return patients
+
+
+def patient_userid(number: int) -> str:
+    return f"patient{number:05d}"
+
+
+def patient_email(number: int) -> str:
+    return f"{patient_userid(number)}@example.com"
+
+
+def seed(db, users: int) -> int:
+    """Write ``users`` synthetic patients and returns the number of documents."""
+    patients = load_sample_patients()
+    batch = db.batch()
+    written = 0
+
+    def write(collection_name, document_id, document):
+        nonlocal batch, written
+        batch.set(db.collection(collection_name).document(document_id), document)
+        written += 1
+        if len(batch) == MAX_BATCH_WRITES:
+            batch.commit()
+            batch = db.batch()
+
+    for number in range(users):
+        userid = patient_userid(number)
+        write(
+            "users",
+            userid,
+            {
+                "userid": userid,
+                "firstname": "Patient",
+                "lastname": f"{number:05d}",
+                "displayName": f"Patient {number:05d}",
+                "email": patient_email(number),
+                "age": 40 + number % 35,
+                "height": "5 feet 10 inches",
+                "gender": ("Male", "Female", "Other")[number % 3],
+                "activity": "light exercise 1-3 times per week",
+                "notes": "I want to lose weight and lower my A1c.",
+            },
+        )
+        for collection_name, rows in patients[number % len(patients)].items():
+            for row_number, row in enumerate(rows):
+                write(
+                    collection_name,
+                    f"{userid}-{row_number}",
+                    {**row, "userid": userid},
+                )
+    batch.commit()
+    return written
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=10, help="patients to create")
+    parser.add_argument("--db", default=FAKE_DB_PATH, help="SQLite file to seed")
+    parser.add_argument(
+        "--reset", action="store_true", help="delete the database file first"
+    )
+    args = parser.parse_args()
+
+    if args.reset:
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(args.db + suffix):
+                os.remove(args.db + suffix)
+
+    started = time.perf_counter()
+    written = seed(get_fake_db(args.db), args.users)
+    seconds = time.perf_counter() - started
+    print(
+        f"Seeded {args.users} patients ({written} documents) into {args.db} "
+        f"in {seconds:.1f}s"
+    )
+
+
+if __name__ == "__main__":
+    main()
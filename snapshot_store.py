@@ -0,0 +1,67 @@
+import json
+import os
+import time
+
+import pandas as pd
+
+SNAPSHOT_DIR = os.environ.get(
+    "SNAPSHOT_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".snapshots"),
+)
+
+# A snapshot older than this is thrown away and the collection is reloaded in
+# full, which picks up edits to old records and deleted documents.
+SNAPSHOT_MAX_AGE = int(os.environ.get("SNAPSHOT_MAX_AGE", str(7 * 24 * 3600)))
+
+
+class UserSnapshot:
+    """On-disk copy of one user's profile collections.
+
+    Every collection is stored as ``<collection>.parquet`` plus a
+    ``<collection>.json`` sidecar with its sync state: the high-water mark
+    (the newest record date seen) and the time of the last full load. Each
+    collection has its own files, so the concurrent loaders never write to
+    the same file.
+
+    Args:
+        userid (str): The id of the user the snapshot belongs to.
+        root (str): The directory that holds every user's snapshot.
+    """
+
+    def __init__(self, userid: str, root: str = SNAPSHOT_DIR):
+        self.userid = userid
+        self.directory = os.path.join(root, userid)
+
+    def _path(self, collection_name: str, extension: str) -> str:
+        return os.path.join(self.directory, f"{collection_name}.{extension}")
+
+    def load(self, collection_name: str):
+        """Returns ``(frame, state)``, or ``(None, None)`` when there is no
+        snapshot of the collection or it is older than SNAPSHOT_MAX_AGE."""
+        try:
+            with open(self._path(collection_name, "json"), encoding="utf-8") as f:
+                state = json.load(f)
+            if time.time() - state["full_load_at"] > SNAPSHOT_MAX_AGE:
+                return None, None
+            frame = pd.read_parquet(self._path(collection_name, "parquet"))
+            return frame, state
+        except FileNotFoundError:
+            return None, None
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Ignoring unreadable snapshot of {collection_name}: {e}")
+            return None, None
+
+    def save(self, collection_name: str, frame: pd.DataFrame, state: dict) -> None:
+        """Write the collection and its sync state.
+
+        Both files are written next to their target and renamed into place, so
+        a reader sees the old snapshot or the new one, never half of one.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        parquet_path = self._path(collection_name, "parquet")
+        json_path = self._path(collection_name, "json")
+        frame.to_parquet(f"{parquet_path}.tmp", index=False)
+        with open(f"{json_path}.tmp", "w", encoding="utf-8") as f:
+            json.dump(state, f)
+        os.replace(f"{parquet_path}.tmp", parquet_path)
+        os.replace(f"{json_path}.tmp", json_path)
@@ -0,0 +1,128 @@
+import hashlib
+
+import numpy as np
+import pandas as pd
+
+
+def _as_float(value: np.float32) -> float:
+    # The shortest decimal that round-trips the float32, so a stored 198.3
+    # comes back as 198.3 and not 198.3000030517578.
+    return float(str(value))
+
+
+class TimeSeries:
+    """One user's readings of a single measurement, sorted by time.
+
+    The timestamps are a ``datetime64[s]`` array and the values a ``float32``
+    array, so a reading takes 12 bytes instead of a Python string and a
+    Python number in an object column. Because the timestamps are sorted,
+    a time window is found with two binary searches.
+
+    Args:
+        times: Timestamps, anything ``np.asarray(..., dtype="datetime64[s]")``
+            accepts.
+        values: The reading at each timestamp. Missing readings are NaN.
+        name (str): The name of the measurement, e.g. "BloodSugarLevel(mg/dl)".
+    """
+
+    __slots__ = ("times", "values", "name")
+
+    def __init__(self, times, values, name: str = None):
+        times = np.asarray(times, dtype="datetime64[s]")
+        values = np.asarray(values, dtype="float32")
+        if times.shape != values.shape or times.ndim != 1:
+            raise ValueError("times and values must be 1-D arrays of the same length")
+        order = np.argsort(times, kind="stable")
+        self.times = times[order]
+        self.values = values[order]
+        self.name = name
+
+    @classmethod
+    def from_frame(cls, frame: pd.DataFrame, time_column: str, value_column: str):
+        """Build a series from two columns of a loaded DataFrame.
+
+        The time column holds ISO 8601 strings as they are stored in Firestore.
+        Rows whose timestamp does not parse cannot be placed on the time axis
+        and are dropped; values that do not parse become NaN.
+        """
+        times = pd.to_datetime(
+            frame[time_column], errors="coerce", format="ISO8601"
+        ).to_numpy(dtype="datetime64[s]")
+        values = pd.to_numeric(frame[value_column], errors="coerce").to_numpy(
+            dtype="float32", na_value=np.nan
+        )
+        keep = ~np.isnat(times)
+        return cls(times[keep], values[keep], name=value_column)
+
+    def __len__(self) -> int:
+        return len(self.times)
+
+    def __repr__(self) -> str:
+        if not len(self):
+            return f"TimeSeries({self.name!r}, empty)"
+        return (
+            f"TimeSeries({self.name!r}, {len(self)} readings, "
+            f"{self.times[0]} .. {self.times[-1]})"
+        )
+
+    @property
+    def nbytes(self) -> int:
+        return self.times.nbytes + self.values.nbytes
+
+    @property
+    def start(self):
+        return self.times[0] if len(self) else None
+
+    @property
+    def end(self):
+        return self.times[-1] if len(self) else None
+
+    def between(self, start=None, end=None) -> "TimeSeries":
+        """The readings with ``start <= time < end``, in O(log n).
+
+        Args:
+            start: Inclusive lower bound (datetime, np.datetime64 or ISO
+                string), or None for no bound.
+            end: Exclusive upper bound, or None for no bound.
+
+        Returns:
+            TimeSeries: A view on this series' arrays, not a copy.
+        """
+        lo = 0 if start is None else self._position(start)
+        hi = len(self) if end is None else self._position(end)
+        window = TimeSeries.__new__(TimeSeries)
+        window.times = self.times[lo:hi]
+        window.values = self.values[lo:hi]
+        window.name = self.name
+        return window
+
+    def last(self, duration) -> "TimeSeries":
+        """The readings in the ``duration`` (a timedelta) before the newest one."""
+        if not len(self):
+            return self
+        return self.between(self.end - np.timedelta64(duration, "s"))
+
+    def _position(self, moment) -> int:
+        return int(np.searchsorted(self.times, np.datetime64(moment, "s"), "left"))
+
+    def first_value(self) -> float:
+        return _as_float(self.values[0]) if len(self) else None
+
+    def last_value(self) -> float:
+        return _as_float(self.values[-1]) if len(self) else None
+
+    def mean(self) -> float:
+        """The mean of the readings that exist, or 0.0 without any."""
+        present = self.values[~np.isnan(self.values)]
+        # Accumulate in float64; float32 sums drift on long series.
+        return float(present.mean(dtype="float64")) if len(present) else 0.0
+
+    def fingerprint(self) -> bytes:
+        """A digest of the timestamps and values, for content-keyed caches."""
+        digest = hashlib.sha1(self.times.tobytes())
+        digest.update(self.values.tobytes())
+        return digest.digest()
+
+    def to_frame(self, time_column: str = "DateTime") -> pd.DataFrame:
+        """The series as a two-column DataFrame, for charts and older code."""
+        return pd.DataFrame({time_column: self.times, self.name: self.values})
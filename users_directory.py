@@ -0,0 +1,101 @@
+import os
+import threading
+import time
+
+import streamlit as st
+
+from data_backend import get_db
+from frame_builder import FrameBuilder
+
+USERS_CACHE_TTL = int(os.environ.get("USERS_CACHE_TTL", "300"))
+
+# Columns of the users table on the Settings page. The userid column is not
+# shown; it tells which user a selected row is.
+USERS_TABLE_COLUMNS = {
+    "Name": ("displayName", "string"),
+    "Email": ("email", "string"),
+    "userid": ("userid", "string"),
+}
+
+
+class UsersDirectory:
+    """Process-wide copy of the ``users`` collection.
+
+    One instance is shared by every browser session (see
+    ``get_users_directory``). The collection is streamed at most once per TTL,
+    or again after ``invalidate()``, which the Settings page calls whenever it
+    adds or deletes a user. Lookups by email or userid are dictionary hits, so
+    they cost the same however many patients there are. The lists and frames
+    it hands out are shared, so callers must treat them as read-only.
+
+    Args:
+        db: The Firestore client.
+        ttl (int): Seconds before the copy is reloaded from Firestore.
+    """
+
+    def __init__(self, db, ttl: int = USERS_CACHE_TTL):
+        self.db = db
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._loaded_at = None
+        self._users = []
+        self._by_email = {}
+        self._by_userid = {}
+        self._table = None
+
+    def _is_stale(self) -> bool:
+        return self._loaded_at is None or time.monotonic() - self._loaded_at > self.ttl
+
+    def _refresh(self) -> None:
+        with self._lock:
+            if not self._is_stale():
+                return
+            users = [
+                {"userid": doc.id, **doc.to_dict()}
+                for doc in self.db.collection("users").stream()
+            ]
+            by_email = {}
+            for user in users:
+                if user.get("email"):
+                    # The first match wins, as it did with the old list scans.
+                    by_email.setdefault(user["email"], user)
+            self._users = users
+            self._by_email = by_email
+            self._by_userid = {user["userid"]: user for user in users}
+            self._table = FrameBuilder(USERS_TABLE_COLUMNS).extend(users).build()
+            self._loaded_at = time.monotonic()
+
+    def invalidate(self) -> None:
+        """Forget the cached copy so the next access reloads it."""
+        with self._lock:
+            self._loaded_at = None
+
+    @property
+    def users(self) -> list:
+        if self._is_stale():
+            self._refresh()
+        return self._users
+
+    def table(self):
+        """The users as a USERS_TABLE_COLUMNS DataFrame, in the order of ``users``."""
+        if self._is_stale():
+            self._refresh()
+        return self._table
+
+    def find_by_email(self, email: str):
+        """Returns the user with the given email, or None."""
+        if self._is_stale():
+            self._refresh()
+        return self._by_email.get(email)
+
+    def find_by_userid(self, userid: str):
+        """Returns the user with the given Firestore document id, or None."""
+        if self._is_stale():
+            self._refresh()
+        return self._by_userid.get(userid)
+
+
+@st.cache_resource
+def get_users_directory() -> UsersDirectory:
+    """The UsersDirectory shared by all sessions of this Streamlit process."""
+    return UsersDirectory(get_db())